@@ -12,6 +12,7 @@ class ApiConfig(AppConfig):
         try:
             # Import signals to ensure they're loaded
             from . import models  # This will load the signals
+            from . import authentication  # Cached JWT user invalidation
             
             # Import here to avoid circular imports
             from .services.professor_file_watcher import setup_auto_sync
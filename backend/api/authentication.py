@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import router
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import UserProfile
+
+
+def user_cache_key(user_id):
+    return f'jwt:user:{user_id}'
+
+
+# User columns kept in the cache; anything else (password hash included) is
+# deferred and loaded from the database only if a view reads it
+_CACHED_USER_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser')
+_CACHED_PROFILE_FIELDS = ('id', 'user_id', 'program', 'profile_pic', 'bio', 'banner_style', 'profile_mode')
+
+
+def _from_cached_fields(model, values):
+    """Instance holding only the given column values; from_db marks the rest deferred, so save() writes only these"""
+    # from_db expects the values in the model's concrete field order
+    field_names = [f.attname for f in model._meta.concrete_fields if f.attname in values]
+    return model.from_db(router.db_for_read(model), field_names, [values[name] for name in field_names])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that loads the user together with their profile and
+    keeps both in the cache, so repeat requests with a valid token skip the
+    auth_user and api_userprofile lookups.
+    Entries are keyed by user id rather than token, so every token of a user
+    shares one entry and saving or deleting the user or their profile drops it.
+    Only a few columns are cached, with an MD5 of the password hash so the
+    per-token revocation check still runs on a hit. Changes made with
+    QuerySet.update() skip the signals and show up once JWT_USER_CACHE_TTL runs out.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        ttl = getattr(settings, 'JWT_USER_CACHE_TTL', 300)
+        if ttl <= 0:
+            # Caching disabled: don't read entries left over from when it wasn't either
+            return self._fetch_user(validated_token, user_id)
+
+        key = user_cache_key(user_id)
+        entry = cache.get(key)
+        if entry is not None:
+            self._check_user(validated_token, entry['user']['is_active'], entry['password_md5'])
+            return self._user_from_entry(entry)
+
+        user = self._fetch_user(validated_token, user_id)
+        cache.set(key, self._entry_for_user(user), ttl)
+        return user
+
+    @staticmethod
+    def _entry_for_user(user):
+        profile = getattr(user, 'profile', None)
+        return {
+            'user': {name: getattr(user, name) for name in _CACHED_USER_FIELDS},
+            'profile': {name: getattr(profile, name) for name in _CACHED_PROFILE_FIELDS} if profile else None,
+            'password_md5': get_md5_hash_password(user.password),
+        }
+
+    def _user_from_entry(self, entry):
+        user = _from_cached_fields(self.user_model, entry['user'])
+        if entry['profile'] is not None:
+            user.profile = _from_cached_fields(UserProfile, entry['profile'])
+        return user
+
+    @staticmethod
+    def _check_user(validated_token, is_active, password_md5):
+        """The per-token checks JWTAuthentication.get_user makes once the user is loaded"""
+        if api_settings.CHECK_USER_IS_ACTIVE and not is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != password_md5:
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+    def _fetch_user(self, validated_token, user_id):
+        """JWTAuthentication.get_user, with the profile most views read joined in"""
+        try:
+            user = self.user_model.objects.select_related('profile').get(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+
+        self._check_user(validated_token, user.is_active, get_md5_hash_password(user.password))
+        return user
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    cache.delete(user_cache_key(instance.pk))
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_user_profile(sender, instance, **kwargs):
+    cache.delete(user_cache_key(instance.user_id))
@@ -8,6 +8,7 @@ from datetime import datetime, timedelta
 import pytz
 from .models import UserCalendar, SharedSchedule
 from .serializers import UserCalendarSerializer, CreateUserCalendarSerializer, SharedScheduleSerializer, CreateSharedScheduleSerializer
+from .utils import build_url
 
 
 class UserCalendarViewSet(viewsets.ModelViewSet):
@@ -348,7 +349,7 @@ class SharedScheduleViewSet(viewsets.ModelViewSet):
             response_serializer = SharedScheduleSerializer(shared_schedule)
             return Response({
                 'shared_schedule': response_serializer.data,
-                'share_url': f"https://kairoo.ca/schedule/{shared_schedule.id}"
+                'share_url': build_url(f"/schedule/{shared_schedule.id}")
             }, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -3,7 +3,7 @@ import os
 from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
 from api.models import Professor, Course, Term, CourseOffering # MODIFIED: Added Term and CourseOffering
-from django.db import utils as db_utils # For IntegrityError
+from django.db import transaction, utils as db_utils # For IntegrityError
 
 class Command(BaseCommand):
     help = 'Populates the database with Professor, Course, Term, and CourseOffering data from JSON files located in api/data/' # MODIFIED: Updated help text
@@ -27,6 +27,21 @@ class Command(BaseCommand):
 
         self.stdout.write(self.style.SUCCESS("Data population process completed."))
 
+    def _read_json(self, path):
+        # Single read site for the data files; raises FileNotFoundError/JSONDecodeError for the callers to report
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def _professor_lookup(self):
+        """Map existing professors by email and by name (names can repeat, so lists)"""
+        professors_by_email = {}
+        professors_by_name = {}
+        for professor in Professor.objects.all():
+            if professor.email:
+                professors_by_email[professor.email] = professor
+            professors_by_name.setdefault(professor.name, []).append(professor)
+        return professors_by_email, professors_by_name
+
     def _load_professors(self):
         self.stdout.write(self.style.HTTP_INFO("Populating professors..."))
         if not os.path.exists(self.PROFESSORS_FILE):
@@ -35,8 +50,7 @@ class Command(BaseCommand):
             return
 
         try:
-            with open(self.PROFESSORS_FILE, 'r') as f:
-                professors_data = json.load(f)
+            professors_data = self._read_json(self.PROFESSORS_FILE)
         except json.JSONDecodeError:
             self.stderr.write(self.style.ERROR(f"Invalid JSON in {self.PROFESSORS_FILE}"))
             self.stdout.write(self.style.WARNING("Skipping professor population."))
@@ -47,8 +61,12 @@ class Command(BaseCommand):
             return
 
 
+        # Load existing professors once, keyed the way the lookups below match them,
+        # instead of a get_or_create round trip per JSON row
+        professors_by_email, professors_by_name = self._professor_lookup()
+
         count = 0
-        created_count = 0
+        new_professors = []
         for prof_data in professors_data:
             try:
                 # Use email as the primary unique identifier if available, otherwise name.
@@ -69,26 +87,42 @@ class Command(BaseCommand):
                 # Remove None values from defaults to avoid overriding existing valid data with None
                 defaults = {k: v for k, v in defaults.items() if v is not None}
 
-
+                identifier = prof_data[identifier_field]
                 if identifier_field == 'email':
-                    professor, created = Professor.objects.get_or_create(
-                        email=prof_data['email'],
-                        defaults=defaults
-                    )
+                    exists = identifier in professors_by_email
                 else: # identifier_field == 'name'
-                     professor, created = Professor.objects.get_or_create(
-                        name=prof_data['name'],
-                        defaults=defaults
-                    )
-                
-                if created:
-                    created_count += 1
+                    matches = professors_by_name.get(identifier, [])
+                    if len(matches) > 1:
+                        raise Professor.MultipleObjectsReturned(f"{len(matches)} professors named '{identifier}'")
+                    exists = bool(matches)
+
+                if not exists:
+                    # Same field precedence as get_or_create: defaults over the lookup value
+                    professor = Professor(**{identifier_field: identifier, **defaults})
+                    new_professors.append(professor)
+                    if professor.email:
+                        professors_by_email[professor.email] = professor
+                    professors_by_name.setdefault(professor.name, []).append(professor)
                 count += 1
-            except db_utils.IntegrityError as e:
-                self.stderr.write(self.style.ERROR(f"Integrity error for professor {prof_data.get('name', 'N/A')}: {e}"))
             except Exception as e:
                 self.stderr.write(self.style.ERROR(f"Error processing professor {prof_data.get('name', 'N/A')}: {e}"))
 
+        created_count = 0
+        try:
+            with transaction.atomic():
+                Professor.objects.bulk_create(new_professors, batch_size=500)
+            created_count = len(new_professors)
+        except db_utils.IntegrityError:
+            # One bad row fails the whole bulk insert; retry row by row so only that row is skipped
+            for professor in new_professors:
+                professor.pk = None # An earlier batch may have been assigned ids before the rollback
+                try:
+                    with transaction.atomic():
+                        professor.save(force_insert=True)
+                    created_count += 1
+                except db_utils.IntegrityError as e:
+                    self.stderr.write(self.style.ERROR(f"Error processing professor {professor.name or 'N/A'}: {e}"))
+
 
         self.stdout.write(self.style.SUCCESS(f"Processed {count} professors. Created {created_count} new professors."))
 
@@ -100,8 +134,7 @@ class Command(BaseCommand):
             return
 
         try:
-            with open(self.COURSES_FILE, 'r') as f:
-                courses_data = json.load(f)
+            courses_data = self._read_json(self.COURSES_FILE)
         except json.JSONDecodeError:
             self.stderr.write(self.style.ERROR(f"Invalid JSON in {self.COURSES_FILE}"))
             self.stdout.write(self.style.WARNING("Skipping course population."))
@@ -111,6 +144,10 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING("Skipping course population."))
             return
 
+        # One query each for existing courses and professors instead of a lookup per row
+        courses_by_code = {course.code: course for course in Course.objects.all()}
+        professors_by_email, professors_by_name = self._professor_lookup()
+
         count = 0
         created_count = 0
         for course_data in courses_data:
@@ -131,36 +168,33 @@ class Command(BaseCommand):
                     del defaults['units']
 
 
-                course, created = Course.objects.get_or_create(
-                    code=course_code,
-                    defaults=defaults
-                )
-                if created:
+                course = courses_by_code.get(course_code)
+                if course is None:
+                    course = Course.objects.create(code=course_code, **defaults)
+                    courses_by_code[course_code] = course
                     created_count +=1
                 count += 1
 
                 professor_identifiers = course_data.get('professors', []) # Expect list of emails or names
                 
-                # Clear existing professors for this course to ensure data matches JSON
+                # Replace this course's professors so the association matches the JSON.
                 # This makes the command idempotent for professor associations as well.
-                # If you want to only add and never remove, comment out the next line.
-                course.professors.clear() 
-
+                professors = []
                 for prof_identifier in professor_identifiers:
-                    try:
-                        # Try to find professor by email first, then by name
-                        professor = Professor.objects.get(email=prof_identifier)
-                    except Professor.DoesNotExist:
-                        try:
-                            professor = Professor.objects.get(name=prof_identifier)
-                        except Professor.DoesNotExist:
+                    # Try to find professor by email first, then by name
+                    professor = professors_by_email.get(prof_identifier)
+                    if professor is None:
+                        matches = professors_by_name.get(prof_identifier, [])
+                        if not matches:
                             self.stderr.write(self.style.WARNING(f"Professor '{prof_identifier}' not found for course {course_code}. Skipping association."))
                             continue
-                    except Professor.MultipleObjectsReturned:
-                         self.stderr.write(self.style.WARNING(f"Multiple professors found for identifier '{prof_identifier}' for course {course_code}. Please use a unique identifier (like email). Skipping association."))
-                         continue
-                    
-                    course.professors.add(professor)
+                        if len(matches) > 1:
+                            self.stderr.write(self.style.WARNING(f"Multiple professors found for identifier '{prof_identifier}' for course {course_code}. Please use a unique identifier (like email). Skipping association."))
+                            continue
+                        professor = matches[0]
+                    professors.append(professor)
+
+                course.professors.set(professors)
 
             except db_utils.IntegrityError as e:
                 self.stderr.write(self.style.ERROR(f"Integrity error for course {course_data.get('code', 'N/A')}: {e}"))
@@ -179,8 +213,7 @@ class Command(BaseCommand):
             return
 
         try:
-            with open(self.TERM_COURSES_FILE, 'r') as f:
-                term_courses_data = json.load(f)
+            term_courses_data = self._read_json(self.TERM_COURSES_FILE)
         except json.JSONDecodeError:
             self.stderr.write(self.style.ERROR(f"Invalid JSON in {self.TERM_COURSES_FILE}"))
             self.stdout.write(self.style.WARNING("Skipping term and course offering population."))
@@ -196,6 +229,9 @@ class Command(BaseCommand):
         offering_updated_count = 0
         offering_processed_count = 0
 
+        # Courses are shared across terms; look them up in memory rather than per offering
+        courses_by_code = {course.code: course for course in Course.objects.all()}
+
         for term_name, course_offerings_list in term_courses_data.items():
             term_processed_count += 1
             try:
@@ -241,6 +277,14 @@ class Command(BaseCommand):
                     term_obj.save()
                     self.stdout.write(self.style.SUCCESS(f"Updated existing term (Code: {term_code_parsed}) to Name: '{term_name_cleaned}', Season: '{season_parsed}'."))
                 
+                # Existing offerings for this term in one query, keyed like the unique_together
+                # (course, term, section); rows are matched in memory and written in bulk below
+                offerings_by_key = {
+                    (offering.course_id, offering.section): offering
+                    for offering in CourseOffering.objects.filter(term=term_obj)
+                }
+                offerings_to_update = {}
+
                 for offering_data in course_offerings_list:
                     offering_processed_count += 1
                     try:
@@ -253,68 +297,51 @@ class Command(BaseCommand):
 
                         # Get or create Course
                         # Defaults for description, units, department are empty/None if not in this data source
-                        course_defaults = {'title': course_title, 'description': '', 'units': None, 'department': ''}
-                        course_obj, course_created = Course.objects.get_or_create(
-                            code=course_code,
-                            defaults=course_defaults
-                        )
-
-                        if course_created:
+                        course_obj = courses_by_code.get(course_code)
+                        if course_obj is None:
+                            course_obj = Course.objects.create(code=course_code, title=course_title, description='', units=None, department='')
+                            courses_by_code[course_code] = course_obj
                             self.stdout.write(self.style.SUCCESS(f"Created new course '{course_code} - {course_title}' from offerings data."))
                         elif course_obj.title != course_title and course_title: # Update title if different and new one is not empty
                             if not course_obj.title: # If existing title is empty, update it
                                 self.stdout.write(self.style.SUCCESS(f"Updating title for course '{course_code}' from '' to '{course_title}'."))
                                 course_obj.title = course_title
-                                course_obj.save()
+                                course_obj.save(update_fields=['title'])
                             # else: # Optional: If existing title is not empty but different, you might want to log or handle
                                 # self.stdout.write(self.style.WARNING(f"Course '{course_code}' has title '{course_obj.title}', new data suggests '{course_title}'. Not updating existing non-empty title automatically."))
 
-
-                        # Create or update CourseOffering
-                        offering_defaults = {
-                            'instructor': instructor_name,
-                            'schedule': schedule,
-                            'location': location
-                        }
-                        offering_obj, offering_created_updated = CourseOffering.objects.update_or_create(
-                            course=course_obj,
-                            term=term_obj,
-                            section=section,
-                            defaults=offering_defaults
-                        )
-
-                        if offering_created_updated: # This is True if created, False if only updated (for update_or_create)
-                            # Note: update_or_create returns (object, created_boolean)
-                            # The logic here is slightly off, as update_or_create's boolean indicates creation, not update.
-                            # To distinguish, we would need to check if the object existed before.
-                            # For simplicity, we'll just count creations for now based on the boolean.
-                            if offering_created_updated: # if created
-                                offering_created_count +=1
-                            else: # if updated (this else branch won't be hit with current logic for update_or_create)
-                                offering_updated_count +=1 # This count will be off.
-                                                        # A better way: get, then update, or compare fields.
-                                                        # For now, this is a simplified approach.
-                        
-                        # Correct way to count created/updated for update_or_create
-                        # if offering_obj._state.adding:
-                        #    offering_created_count += 1
-                        # else:
-                        #    offering_updated_count += 1 
-                        # Due to the complexity of accurately counting updates without more checks,
-                        # we'll primarily focus on "processed" and "newly created" offerings for now.
-
+                        # Create or update CourseOffering; a repeated key in the JSON updates the
+                        # pending instance, so the last row wins as it did with update_or_create
+                        key = (course_obj.pk, section)
+                        offering_obj = offerings_by_key.get(key)
+                        if offering_obj is None:
+                            offering_obj = CourseOffering(course=course_obj, term=term_obj, section=section)
+                            offerings_by_key[key] = offering_obj
+                        offering_obj.instructor = instructor_name
+                        offering_obj.schedule = schedule
+                        offering_obj.location = location
+                        offerings_to_update[key] = offering_obj
 
                     except db_utils.IntegrityError as e:
                         self.stderr.write(self.style.ERROR(f"Integrity error for offering in term '{term_name}': {offering_data}. Error: {e}"))
                     except Exception as e:
                         self.stderr.write(self.style.ERROR(f"Error processing offering in term '{term_name}': {offering_data}. Error: {e}"))
+
+                new_offerings = [offering for offering in offerings_to_update.values() if offering.pk is None]
+                changed_offerings = [offering for offering in offerings_to_update.values() if offering.pk is not None]
+                try:
+                    CourseOffering.objects.bulk_create(new_offerings, batch_size=500)
+                    CourseOffering.objects.bulk_update(changed_offerings, ['instructor', 'schedule', 'location'], batch_size=500)
+                    offering_created_count += len(new_offerings)
+                    offering_updated_count += len(changed_offerings)
+                except db_utils.IntegrityError as e:
+                    self.stderr.write(self.style.ERROR(f"Integrity error while saving offerings for term '{term_name}': {e}"))
             
             except Exception as e:
                 self.stderr.write(self.style.ERROR(f"Error processing term '{term_name}': {e}"))
 
         self.stdout.write(self.style.SUCCESS(f"Processed {term_processed_count} terms. Created {term_created_count} new terms."))
-        self.stdout.write(self.style.SUCCESS(f"Processed {offering_processed_count} course offerings. Created/Updated {offering_created_count + offering_updated_count} offerings (this count may not accurately distinguish created vs updated)."))
-        # A more accurate created count for offerings can be derived if needed.
+        self.stdout.write(self.style.SUCCESS(f"Processed {offering_processed_count} course offerings. Created {offering_created_count} and updated {offering_updated_count} offerings."))
 
 # Note to user:
 # This command is now created. To use it:
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import Message
+from api.views import MessageView
+
+
+class Command(BaseCommand):
+    help = 'Delete chat messages older than the session expiry window (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=MessageView.SESSION_EXPIRY_DAYS,
+                            help='Delete messages older than this many days')
+        parser.add_argument('--batch-size', type=int, default=MessageView.CLEANUP_BATCH_SIZE,
+                            help='Rows deleted per statement')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timezone.timedelta(days=options['days'])
+        deleted = Message.delete_expired(cutoff, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} messages older than {options['days']} days"))
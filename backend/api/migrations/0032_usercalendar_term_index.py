@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-16 15:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0031_userpreferences'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usercalendar',
+            index=models.Index(fields=['user', 'start_date', 'end_date', 'recurrence_pattern'], name='usercal_term_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-16 16:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0032_usercalendar_term_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['session_id', 'timestamp'], name='message_session_ts_idx'),
+        ),
+    ]
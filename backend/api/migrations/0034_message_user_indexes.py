@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-16 16:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0033_message_session_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='message',
+            name='message_session_ts_idx',
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['user', 'session_id', '-timestamp'], name='msg_user_sess_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['user', 'timestamp'], name='msg_user_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-16 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0034_message_user_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['timestamp'], name='msg_ts_idx'),
+        ),
+    ]
@@ -107,8 +107,36 @@ class Message(models.Model):
     def __str__(self):
         return f"{self.user.username} ({self.role} at {self.timestamp.strftime('%Y-%m-%d %H:%M')}): {self.content[:50]}"
 
+    @classmethod
+    def delete_expired(cls, cutoff, user=None, batch_size=1000, max_batches=None):
+        """Delete messages older than cutoff in primary-key batches; returns how many were deleted"""
+        # No ORDER BY: Meta.ordering would make every batch sort the whole expired range
+        expired = cls.objects.filter(timestamp__lt=cutoff).order_by()
+        if user is not None:
+            expired = expired.filter(user=user)
+
+        deleted = batches = 0
+        while max_batches is None or batches < max_batches:
+            # Bounded DELETE ... WHERE id IN (...) so no single statement holds locks on an unbounded range
+            pks = list(expired.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            deleted += cls.objects.filter(pk__in=pks).delete()[0]
+            batches += 1
+            if len(pks) < batch_size:
+                break
+        return deleted
+
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Serves MessageView's history lookup: filter on user and session, newest first
+            models.Index(fields=['user', 'session_id', '-timestamp'], name='msg_user_sess_ts_idx'),
+            # Serves MessageView's sampled inline cleanup: one user's rows older than a cutoff
+            models.Index(fields=['user', 'timestamp'], name='msg_user_ts_idx'),
+            # Serves purge_expired_messages: every user's rows older than a cutoff
+            models.Index(fields=['timestamp'], name='msg_ts_idx'),
+        ]
 
 
 class CalendarEvent(models.Model):
@@ -318,6 +346,8 @@ class UserCalendar(models.Model):
             models.Index(fields=['user', 'day_of_week']),
             models.Index(fields=['user', 'start_date']),
             models.Index(fields=['created_at']),
+            # Matches ScheduleService.clear_user_schedule's term lookup
+            models.Index(fields=['user', 'start_date', 'end_date', 'recurrence_pattern'], name='usercal_term_idx'),
         ]
     
     def __str__(self):
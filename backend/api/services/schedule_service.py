@@ -1,15 +1,82 @@
+import functools
 import json
 import os
+from bisect import bisect_right, insort
 from pathlib import Path
+from types import SimpleNamespace
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, time, date
 import logging
+import math
+import random
 import re
 from django.contrib.auth.models import User
+from django.db import transaction
 from ..models import UserCalendar
 
 logger = logging.getLogger(__name__)
 
+# Schedule-parsing patterns, compiled once at import
+_YEAR_RE = re.compile(r"(20\d{2})")
+_TIME_RANGE_RE = re.compile(r'(\d{1,2}:\d{2})\s*-\s*(\d{1,2}:\d{2})')
+_TIME_PATTERNS = (
+    re.compile(r'(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})'),  # HH:MM - HH:MM
+    re.compile(r'(\d{1,2})h(\d{2})\s*-\s*(\d{1,2})h(\d{2})'),  # HHhMM - HHhMM (French format)
+)
+_DAY_ABBR_RE = re.compile(r'Mo|Tu|We|Th|Fr|Sa|Su')
+_DAY_TOKEN_SPLIT_RE = re.compile(r"[,/\s]+")
+_DAY_MAP = {
+    'Mo': 'Monday', 'Tu': 'Tuesday', 'We': 'Wednesday',
+    'Th': 'Thursday', 'Fr': 'Friday', 'Sa': 'Saturday', 'Su': 'Sunday'
+}
+
+# Single-letter and two-letter day codes accepted by _parse_days_string
+_DAY_CODE_MAP = {
+    'M': 'Monday', 'Mo': 'Monday',
+    'T': 'Tuesday', 'Tu': 'Tuesday',
+    'W': 'Wednesday', 'We': 'Wednesday',
+    'R': 'Thursday', 'Th': 'Thursday',
+    'F': 'Friday', 'Fr': 'Friday',
+    'S': 'Saturday', 'Sa': 'Saturday',
+    'U': 'Sunday', 'Su': 'Sunday'
+}
+_FULL_DAY_NAMES = frozenset(name.lower() for name in _DAY_CODE_MAP.values())
+
+# One bit per weekday so day overlap is a single AND
+_DAY_BITS = {
+    'Monday': 1, 'Tuesday': 2, 'Wednesday': 4, 'Thursday': 8,
+    'Friday': 16, 'Saturday': 32, 'Sunday': 64
+}
+
+# Start-hour ranges [from, to) for each preferred period of the day
+_TIME_BUCKETS = {
+    'morning': (8, 12),
+    'afternoon': (12, 17),
+    'evening': (17, 21),
+}
+
+# Normalized course sections keyed by (term, data file path, file mtime)
+_COURSE_SECTIONS_CACHE: Dict[Tuple[str, str, float], Dict[str, List[Dict[str, Any]]]] = {}
+
+# Section type keywords, checked in priority order; long forms map to their short code
+# Lookahead so overlapping markers are all found (e.g. both STU and TUT in 'STUT').
+# WORKSHOP doesn't contain WRK, so it needs its own alternative; STUDIO is covered by STU.
+_SECTION_TYPE_RE = re.compile(r'(?=(LAB|DGD|TUT|SEM|LEC|WRK|WORKSHOP|STU))')
+_SECTION_TYPE_ALIASES = {'WORKSHOP': 'WRK'}
+_SECTION_TYPE_PRIORITY = ('LAB', 'DGD', 'TUT', 'SEM', 'LEC', 'WRK', 'STU')
+
+
+@functools.lru_cache(maxsize=4096)
+def _determine_section_type_cached(section_code: str) -> str:
+    """Resolve a section code to its type; codes repeat heavily across a term so results are cached"""
+    found = {_SECTION_TYPE_ALIASES.get(m, m) for m in _SECTION_TYPE_RE.findall(section_code.upper())}
+    for section_type in _SECTION_TYPE_PRIORITY:
+        if section_type in found:
+            return section_type
+    # Default based on section code pattern
+    # If it's just like "A01", "B02" etc, assume LEC
+    return 'LEC'
+
 class ScheduleService:
     """Service to handle schedule generation, section matching, and conflict detection"""
     
@@ -52,6 +119,14 @@ class ScheduleService:
         try:
             course_data_path = cls._get_course_data_path(term)
             
+            # Reuse the normalized sections until the data file changes on disk
+            try:
+                cache_key = (term, str(course_data_path), course_data_path.stat().st_mtime)
+            except OSError:
+                cache_key = None
+            if cache_key in _COURSE_SECTIONS_CACHE:
+                return _COURSE_SECTIONS_CACHE[cache_key]
+            
             with open(course_data_path, 'r', encoding='utf-8') as file:
                 kairoll_data = json.load(file)
             
@@ -63,7 +138,7 @@ class ScheduleService:
             best_key = None
             if matching_keys:
                 def extract_year(k: str) -> int:
-                    m = re.search(r"(20\d{2})", k)
+                    m = _YEAR_RE.search(k)
                     return int(m.group(1)) if m else 0
                 best_key = sorted(matching_keys, key=lambda k: extract_year(k), reverse=True)[0]
             term_data = kairoll_data.get(best_key) if best_key else None
@@ -121,6 +196,11 @@ class ScheduleService:
                     course_sections[course_code].append(section_info)
             
             logger.info(f"Loaded {len(course_sections)} courses for term {term} from KaiRoll")
+            if cache_key:
+                # Drop entries for older versions of this term's data
+                for stale_key in [k for k in _COURSE_SECTIONS_CACHE if k[0] == term]:
+                    _COURSE_SECTIONS_CACHE.pop(stale_key, None)
+                _COURSE_SECTIONS_CACHE[cache_key] = course_sections
             return course_sections
             
         except Exception as e:
@@ -210,13 +290,8 @@ class ScheduleService:
             time_str = time_str.strip()
             
             # Handle different time formats
-            time_patterns = [
-                r'(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})',  # HH:MM - HH:MM
-                r'(\d{1,2})h(\d{2})\s*-\s*(\d{1,2})h(\d{2})',  # HHhMM - HHhMM (French format)
-            ]
-            
-            for pattern in time_patterns:
-                match = re.search(pattern, time_str)
+            for pattern in _TIME_PATTERNS:
+                match = pattern.search(time_str)
                 if match:
                     start_hour, start_min, end_hour, end_min = map(int, match.groups())
                     
@@ -238,43 +313,48 @@ class ScheduleService:
         if not days_input:
             return []
         
-        day_mapping = {
-            'M': 'Monday', 'Mo': 'Monday',
-            'T': 'Tuesday', 'Tu': 'Tuesday', 
-            'W': 'Wednesday', 'We': 'Wednesday',
-            'R': 'Thursday', 'Th': 'Thursday',
-            'F': 'Friday', 'Fr': 'Friday',
-            'S': 'Saturday', 'Sa': 'Saturday',
-            'U': 'Sunday', 'Su': 'Sunday'
-        }
-        
         days = []
         
         # Handle array format like ["Mo", "We", "Fr"]
         if isinstance(days_input, list):
             for item in days_input:
                 # Accept full names as-is
-                if isinstance(item, str) and item.lower() in [v.lower() for v in day_mapping.values()]:
+                if isinstance(item, str) and item.lower() in _FULL_DAY_NAMES:
                     days.append(item.title())
                     continue
                 # Map known abbreviations
-                if item in day_mapping:
-                    days.append(day_mapping[item])
+                if item in _DAY_CODE_MAP:
+                    days.append(_DAY_CODE_MAP[item])
         # Handle string format like "MWF"
         elif isinstance(days_input, str):
             # If it already contains full names separated by commas/spaces
-            tokens = [tok.strip() for tok in re.split(r"[,/\s]+", days_input) if tok.strip()]
-            if any(tok.lower() in [v.lower() for v in day_mapping.values()] for tok in tokens):
+            tokens = [tok for tok in _DAY_TOKEN_SPLIT_RE.split(days_input) if tok]
+            if any(tok.lower() in _FULL_DAY_NAMES for tok in tokens):
                 for tok in tokens:
-                    if tok.lower() in [v.lower() for v in day_mapping.values()]:
+                    if tok.lower() in _FULL_DAY_NAMES:
                         days.append(tok.title())
             else:
                 for char in days_input.upper():
-                    if char in day_mapping:
-                        days.append(day_mapping[char])
+                    if char in _DAY_CODE_MAP:
+                        days.append(_DAY_CODE_MAP[char])
                     
         return days
     
+    @classmethod
+    def _days_to_mask(cls, days: List[str]) -> int:
+        """Encode a list of full day names as a weekday bitmask"""
+        mask = 0
+        for day in days:
+            mask |= _DAY_BITS.get(day, 0)
+        return mask
+    
+    @classmethod
+    def _section_day_mask(cls, section: Dict[str, Any]) -> int:
+        """Get a section's weekday bitmask, cached on the section dict"""
+        if '_day_mask' not in section:
+            section['_day_mask'] = cls._days_to_mask(cls._parse_days_string(section.get('days', [])))
+        return section['_day_mask']
+    
     @classmethod
     def _times_conflict(cls, time1: Tuple[time, time], time2: Tuple[time, time]) -> bool:
         """Check if two time ranges conflict"""
@@ -284,39 +364,85 @@ class ScheduleService:
         # Two time ranges conflict if they overlap
         return not (end1 <= start2 or end2 <= start1)
     
+    @classmethod
+    def _hhmm_to_min(cls, value: str) -> Optional[int]:
+        """Convert an 'HH:MM' string to minutes since midnight (None if unparseable)"""
+        try:
+            hours, minutes = str(value).strip().split(':')
+            return int(hours) * 60 + int(minutes)
+        except (ValueError, TypeError):
+            logger.warning(f"Could not parse time bound: {value}")
+            return None
+    
+    @classmethod
+    def _section_minutes(cls, section: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+        """Get a section's (start, end) as minutes since midnight, cached on the section dict"""
+        if '_mins' not in section:
+            times = cls._parse_time_string(section.get('time', ''))
+            if times:
+                start_time, end_time = times
+                section['_mins'] = (start_time.hour * 60 + start_time.minute, end_time.hour * 60 + end_time.minute)
+            else:
+                section['_mins'] = None
+        return section['_mins']
+    
+    @classmethod
+    def _conflicts_with_busy(cls, section: Dict[str, Any], busy_by_day: Dict[str, List[Tuple[int, int]]]) -> bool:
+        """Check a section against per-day sorted, non-overlapping busy intervals using bisect"""
+        mins = cls._section_minutes(section)
+        days = cls._parse_days_string(section.get('days', []))
+        if not mins or not days:
+            # If we can't parse time/days, assume no conflict
+            return False
+        
+        start, end = mins
+        for day in days:
+            day_list = busy_by_day.get(day)
+            if not day_list:
+                continue
+            # Only the neighbours on either side of the insertion point can overlap
+            idx = bisect_right(day_list, (start, 1 << 30))
+            if (idx > 0 and day_list[idx - 1][1] > start) or (idx < len(day_list) and day_list[idx][0] < end):
+                return True
+        return False
+    
+    @classmethod
+    def _mark_busy(cls, section: Dict[str, Any], busy_by_day: Dict[str, List[Tuple[int, int]]]) -> None:
+        """Record an accepted section's intervals in the per-day busy index"""
+        mins = cls._section_minutes(section)
+        if not mins:
+            return
+        for day in cls._parse_days_string(section.get('days', [])):
+            insort(busy_by_day.setdefault(day, []), mins)
+    
     @classmethod
     def _section_conflicts_with_schedule(cls, section: Dict[str, Any], existing_schedule: List[Dict[str, Any]]) -> bool:
         """Check if a section conflicts with existing schedule"""
         try:
-            # Parse section time and days
-            time_str = section.get('time', '')
-            days_input = section.get('days', [])
-            
-            section_times = cls._parse_time_string(time_str)
-            section_days = cls._parse_days_string(days_input)
+            # Parsed times and day masks are cached on the section dicts
+            section_mins = cls._section_minutes(section)
+            section_mask = cls._section_day_mask(section)
             
-            if not section_times or not section_days:
+            if not section_mins or not section_mask:
                 # If we can't parse time/days, assume no conflict
                 return False
             
             # Check against each item in existing schedule
             for scheduled_item in existing_schedule:
-                scheduled_time_str = scheduled_item.get('time', '')
-                scheduled_days_input = scheduled_item.get('days', [])
-                
-                scheduled_times = cls._parse_time_string(scheduled_time_str)
-                scheduled_days = cls._parse_days_string(scheduled_days_input)
+                # Reject items on other days with a single AND before comparing times
+                common_mask = section_mask & cls._section_day_mask(scheduled_item)
+                if not common_mask:
+                    continue
                 
-                if not scheduled_times or not scheduled_days:
+                scheduled_mins = cls._section_minutes(scheduled_item)
+                if not scheduled_mins:
                     continue
                 
-                # Check if they share any days
-                common_days = set(section_days) & set(scheduled_days)
-                if common_days:
-                    # Check if times conflict on those days
-                    if cls._times_conflict(section_times, scheduled_times):
-                        logger.info(f"[CONFLICT] Found conflict between {section.get('section', 'Unknown')} and {scheduled_item.get('section', 'Unknown')} on {common_days}")
-                        return True
+                # Check if times conflict on those days
+                if cls._times_conflict(section_mins, scheduled_mins):
+                    common_days = [day for day, bit in _DAY_BITS.items() if common_mask & bit]
+                    logger.info(f"[CONFLICT] Found conflict between {section.get('section', 'Unknown')} and {scheduled_item.get('section', 'Unknown')} on {common_days}")
+                    return True
             
             return False
             
@@ -552,9 +678,10 @@ class ScheduleService:
             logger.error(f"Error calculating section priority: {e}")
             return 9999
     
-    @classmethod
-    def _get_term_dates(cls, term: str, year: int = 2025) -> Tuple[date, date]:
-        """Get start and end dates for academic terms"""
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def _get_term_dates(term: str, year: int = 2025) -> Tuple[date, date]:
+        """Get start and end dates for academic terms (cached; only a handful of term/year pairs occur)"""
         # Define standard term dates for University of Ottawa
         if term.lower() == 'fall':
             return date(year, 9, 3), date(year, 12, 2)
@@ -580,7 +707,7 @@ class ScheduleService:
         Returns:
             Number of events successfully added
         """
-        events_added = 0
+        to_create = []
         term_start, term_end = cls._get_term_dates(term, year)
         
         for course_code, section in selected_sections.items():
@@ -606,10 +733,9 @@ class ScheduleService:
                 
                 start_time, end_time = times
                 
-                # Create calendar events for each day of the week
+                # Build one weekly calendar event per day; rows are inserted in bulk below
                 for day in days:
-                    # Use persistent user calendar model for saving
-                    calendar_event = UserCalendar.objects.create(
+                    to_create.append(UserCalendar(
                         user=user,
                         title=title,
                         start_time=start_time,
@@ -622,15 +748,17 @@ class ScheduleService:
                         location=location,
                         recurrence_pattern='weekly',
                         theme='midnight-light-blue'
-                    )
-                    
-                    events_added += 1
-                    logger.info(f"Added calendar event for {course_code} on {day}")
+                    ))
+                
+                logger.info(f"Prepared calendar events for {course_code} on {days}")
                 
             except Exception as e:
                 logger.error(f"Error adding {course_code} to calendar: {e}")
                 continue
         
+        UserCalendar.objects.bulk_create(to_create, batch_size=500)
+        events_added = len(to_create)
+        
         logger.info(f"Successfully added {events_added} calendar events for {user.username}")
         return events_added
     
@@ -658,8 +786,7 @@ class ScheduleService:
                 recurrence_pattern='weekly'
             )
             
-            deleted_count = events_to_remove.count()
-            events_to_remove.delete()
+            deleted_count, _ = events_to_remove.delete()
             
             logger.info(f"Cleared {deleted_count} calendar events for user {user.username} in {term} {year}")
             return deleted_count
@@ -668,6 +795,18 @@ class ScheduleService:
             logger.error(f"Error clearing schedule for {user.username}: {e}")
             return 0 
 
+    @classmethod
+    def replace_user_schedule(cls, user: User, selected_sections: Dict[str, Dict[str, Any]], term: str, year: int = 2025) -> int:
+        """
+        Clear the user's schedule for a term and add the selected sections in one transaction
+        
+        Returns:
+            Number of events added
+        """
+        with transaction.atomic():
+            cls.clear_user_schedule(user, term, year)
+            return cls.add_sections_to_calendar(user, selected_sections, term, year)
+
     @classmethod
     def _extract_time_from_schedule(cls, schedule_input: Any) -> str:
         """Extract time range from schedule input (string or dict)."""
@@ -686,13 +825,9 @@ class ScheduleService:
         except Exception:
             pass
         s = schedule_input if isinstance(schedule_input, str) else str(schedule_input)
-        import re
-        m1 = re.search(r'(\d{1,2}:\d{2})\s*-\s*(\d{1,2}:\d{2})', s)
-        if m1:
-            return f"{m1.group(1)}-{m1.group(2)}"
-        m2 = re.search(r'(\d{1,2}:\d{2})-(\d{1,2}:\d{2})', s)
-        if m2:
-            return f"{m2.group(1)}-{m2.group(2)}"
+        m = _TIME_RANGE_RE.search(s)
+        if m:
+            return f"{m.group(1)}-{m.group(2)}"
         return ''
 
     @classmethod
@@ -706,16 +841,9 @@ class ScheduleService:
                 return cls._parse_days_string(days_val)
         except Exception:
             pass
-        day_mapping = {
-            'Mo': 'Monday', 'Tu': 'Tuesday', 'We': 'Wednesday', 
-            'Th': 'Thursday', 'Fr': 'Friday', 'Sa': 'Saturday', 'Su': 'Sunday'
-        }
-        days = []
         s = schedule_input if isinstance(schedule_input, str) else str(schedule_input)
-        for abbr, name in day_mapping.items():
-            if abbr in s:
-                days.append(name)
-        return days
+        # Single scan; dict.fromkeys drops repeats while keeping first-seen order
+        return list(dict.fromkeys(_DAY_MAP[m] for m in _DAY_ABBR_RE.findall(s)))
 
     @classmethod
     def _determine_section_type(cls, section_code: str) -> str:
@@ -723,27 +851,7 @@ class ScheduleService:
         if not section_code:
             return 'LEC'
         
-        section_upper = section_code.upper()
-        
-        # Check for explicit type indicators in section code
-        if 'LAB' in section_upper:
-            return 'LAB'
-        elif 'DGD' in section_upper:
-            return 'DGD' 
-        elif 'TUT' in section_upper:
-            return 'TUT'
-        elif 'SEM' in section_upper:
-            return 'SEM'
-        elif 'LEC' in section_upper:
-            return 'LEC'
-        elif 'WRK' in section_upper or 'WORKSHOP' in section_upper:
-            return 'WRK'
-        elif 'STU' in section_upper or 'STUDIO' in section_upper:
-            return 'STU'
-        else:
-            # Default based on section code pattern
-            # If it's just like "A01", "B02" etc, assume LEC
-            return 'LEC' 
+        return _determine_section_type_cached(section_code)
 
     @classmethod
     def auto_select_sections_with_preferences(cls, available_sections: Dict[str, List[Dict[str, Any]]], 
@@ -755,7 +863,7 @@ class ScheduleService:
         Args:
             available_sections: Dictionary of course_code -> list of sections
             preferences: User preferences for times, instructors, etc.
-            avoid_sections: List of section codes to avoid (e.g., ['A00-LEC', 'B01-LAB'])
+            avoid_sections: List of exact section codes to avoid (e.g., ['A00-LEC', 'B01-LAB'])
             
         Returns:
             Dictionary of course_code -> selected section (or None if no valid selection)
@@ -765,9 +873,7 @@ class ScheduleService:
             logger.info(f"[SCHEDULE_SELECT] Avoiding sections: {avoid_sections}")
             
             preferences = preferences or {}
-            avoid_sections = avoid_sections or []
-            time_constraints = preferences.get('time_constraints', {})
-            instructor_preferences = preferences.get('instructor_preferences', {})
+            ctx = cls._build_selection_context(preferences, avoid_sections)
             
             # Group sections by course and type
             course_type_sections = {}
@@ -779,38 +885,44 @@ class ScheduleService:
                         course_type_sections[course_code][section_type] = []
                     course_type_sections[course_code][section_type].append(section)
             
-            selected_sections = {}
-            all_selected = []  # Track all selected sections for conflict checking
-            
-            # Select sections for each course
-            for course_code, type_sections in course_type_sections.items():
-                selected_sections[course_code] = {}
+            picks: Dict[Tuple[str, str], Dict[str, Any]] = {}
+            busy_by_day: Dict[str, List[Tuple[int, int]]] = {}  # Selected intervals per day, for conflict checking
+            
+            # Select one section per (course, type) group, most constrained groups first
+            groups = {
+                (course_code, section_type): sections
+                for course_code, type_sections in course_type_sections.items()
+                for section_type, sections in type_sections.items()
+            }
+            for course_code, section_type in cls._order_groups_by_conflicts(groups):
+                best_section = cls._find_best_section(
+                    groups[(course_code, section_type)], busy_by_day, ctx, course_code
+                )
                 
-                # For each section type (LEC, LAB, DGD, etc.)
-                for section_type, sections in type_sections.items():
-                    best_section = cls._find_best_section(
-                        sections, all_selected, avoid_sections, 
-                        time_constraints, instructor_preferences, course_code
-                    )
-                    
-                    if best_section:
-                        selected_sections[course_code][section_type] = best_section
-                        all_selected.append(best_section)
-                        logger.info(f"[SCHEDULE_SELECT] Selected {course_code} {section_type}: {best_section.get('section', 'Unknown')}")
-                    else:
-                        logger.warning(f"[SCHEDULE_SELECT] No valid {section_type} section found for {course_code}")
-            
-            # Flatten the result to match the expected format
-            result = {}
-            for course_code, type_sections in selected_sections.items():
-                if type_sections:
-                    # For now, return all selected sections for the course
-                    # The calling code will handle multiple sections per course
-                    result[course_code] = list(type_sections.values())
+                if best_section:
+                    picks[(course_code, section_type)] = best_section
+                    cls._mark_busy(best_section, busy_by_day)
+                    logger.info(f"[SCHEDULE_SELECT] Selected {course_code} {section_type}: {best_section.get('section', 'Unknown')}")
                 else:
-                    result[course_code] = None
-            
-            logger.info(f"[SCHEDULE_SELECT] Final selection: {[(code, len(sections) if sections else 0) for code, sections in result.items()]}")
+                    logger.warning(f"[SCHEDULE_SELECT] No valid {section_type} section found for {course_code}")
+            
+            # Greedy picks can strand a group that would fit had a neighbour taken another section
+            for key in groups:
+                if key not in picks and cls._repair_stranded_group(key, groups, picks, ctx):
+                    logger.info(f"[SCHEDULE_SELECT] Placed {key[0]} {key[1]} by moving a conflicting section")
+            
+            # Return all selected sections per course, in the course's original type order
+            # The calling code will handle multiple sections per course
+            result = {
+                course_code: [
+                    picks[(course_code, section_type)]
+                    for section_type in type_sections
+                    if (course_code, section_type) in picks
+                ] or None
+                for course_code, type_sections in course_type_sections.items()
+            }
+            
+            logger.info(f"[SCHEDULE_SELECT] Final selection: {len(picks)} sections across {len(result)} courses")
             return result
             
         except Exception as e:
@@ -819,73 +931,149 @@ class ScheduleService:
             return cls.auto_select_sections(available_sections)
     
     @classmethod
-    def _find_best_section(cls, sections: List[Dict[str, Any]], existing_sections: List[Dict[str, Any]], 
-                          avoid_sections: List[str], time_constraints: Dict[str, Any], 
-                          instructor_preferences: Dict[str, Any], course_code: str) -> Optional[Dict[str, Any]]:
-        """Find the best section based on preferences and constraints"""
+    def _build_selection_context(cls, preferences: Dict[str, Any], avoid_sections: Optional[List[str]]) -> SimpleNamespace:
+        """Derive everything the per-section checks need from the preferences, once per selection run"""
+        time_constraints = preferences.get('time_constraints', {})
+        instructor_preferences = preferences.get('instructor_preferences', {})
+        
+        # Lowercase the avoided instructors once; longer lists are matched with one alternation
+        avoid_instructors = [str(a).lower() for a in instructor_preferences.get('avoid_instructors', []) if a]
+        avoid_instructors_re = (
+            re.compile('|'.join(re.escape(a) for a in avoid_instructors))
+            if len(avoid_instructors) > 4 else None
+        )
+        
+        return SimpleNamespace(
+            avoid_sections=set(avoid_sections or []),
+            avoid_instructors=avoid_instructors,
+            avoid_instructors_re=avoid_instructors_re,
+            avoid_day_mask=cls._days_to_mask(cls._parse_days_string(time_constraints.get('avoid_days', []))),
+            earliest_min=cls._hhmm_to_min(time_constraints.get('earliest_start', '06:00')),
+            latest_min=cls._hhmm_to_min(time_constraints.get('latest_end', '22:00')),
+            preferred_buckets=[
+                _TIME_BUCKETS[pref_time.lower()]
+                for pref_time in time_constraints.get('preferred_times', [])
+                if isinstance(pref_time, str) and pref_time.lower() in _TIME_BUCKETS
+            ],
+            # Per-run RNG for score jitter; an explicit 'seed' preference makes selection reproducible
+            rng=random.Random(preferences.get('seed')),
+        )
+    
+    @classmethod
+    def _order_groups_by_conflicts(cls, groups: Dict[Tuple[str, str], List[Dict[str, Any]]]) -> List[Tuple[str, str]]:
+        """
+        Order (course, type) groups for greedy selection, most constrained first
         
-        avoid_instructors = instructor_preferences.get('avoid_instructors', [])
-        earliest_start = time_constraints.get('earliest_start', '06:00')
-        latest_end = time_constraints.get('latest_end', '22:00')
-        avoid_days = time_constraints.get('avoid_days', [])
+        Groups with the fewest sections go first, then those whose sections overlap
+        most with other groups' sections (same day, overlapping times), so tightly
+        constrained courses claim their slots before flexible ones can take them.
+        This is only an ordering; _repair_stranded_group handles what it still misses.
+        """
+        slots = []
+        for key, sections in groups.items():
+            for section in sections:
+                mins = cls._section_minutes(section)
+                day_mask = cls._section_day_mask(section)
+                if mins and day_mask:
+                    slots.append((key, day_mask, mins[0], mins[1]))
         
-        # Score and filter sections
-        scored_sections = []
+        degree = dict.fromkeys(groups, 0)
+        for i, (key_a, mask_a, start_a, end_a) in enumerate(slots):
+            for key_b, mask_b, start_b, end_b in slots[i + 1:]:
+                if key_a != key_b and mask_a & mask_b and start_a < end_b and start_b < end_a:
+                    degree[key_a] += 1
+                    degree[key_b] += 1
+        
+        # sorted() is stable, so equally constrained groups keep their original order
+        return sorted(groups, key=lambda key: (len(groups[key]), -degree[key]))
+    
+    @classmethod
+    def _repair_stranded_group(cls, key: Tuple[str, str], groups: Dict[Tuple[str, str], List[Dict[str, Any]]],
+                               picks: Dict[Tuple[str, str], Dict[str, Any]], ctx: SimpleNamespace) -> bool:
+        """
+        Place a group the greedy pass left without a section by un-picking one conflicting
+        neighbour, picking for the stranded group, then re-picking the neighbour around it.
+        Updates picks and returns True on success; picks are left untouched otherwise.
+        """
+        for other, placed in list(picks.items()):
+            if not cls._section_conflicts_with_schedule(placed, groups[key]):
+                continue
+            
+            busy_by_day: Dict[str, List[Tuple[int, int]]] = {}
+            for pick_key, section in picks.items():
+                if pick_key != other:
+                    cls._mark_busy(section, busy_by_day)
+            
+            section = cls._find_best_section(groups[key], busy_by_day, ctx, key[0])
+            if not section:
+                continue
+            cls._mark_busy(section, busy_by_day)
+            replacement = cls._find_best_section(groups[other], busy_by_day, ctx, other[0])
+            if replacement:
+                picks[key] = section
+                picks[other] = replacement
+                return True
+        return False
+    
+    @classmethod
+    def _find_best_section(cls, sections: List[Dict[str, Any]], busy_by_day: Dict[str, List[Tuple[int, int]]], 
+                          ctx: SimpleNamespace, course_code: str) -> Optional[Dict[str, Any]]:
+        """Find the best section based on the preferences and constraints in ctx"""
+        
+        # Filter sections, then score the survivors in one batch
+        candidates = []
         
         for section in sections:
             section_code = section.get('section', '')
-            instructor = section.get('instructor', '').strip()
+            instructor = section.get('instructor', '').strip().lower()
             
             # Skip if in avoid list
-            if any(avoid_sec in section_code for avoid_sec in avoid_sections):
+            if section_code in ctx.avoid_sections:
                 continue
                 
-            # Skip if conflicts with existing sections
-            if cls._section_conflicts_with_schedule(section, existing_sections):
+            # Skip if conflicts with already selected sections
+            if cls._conflicts_with_busy(section, busy_by_day):
                 continue
                 
             # Skip if instructor should be avoided
-            if any(avoid_inst.lower() in instructor.lower() for avoid_inst in avoid_instructors):
+            if ctx.avoid_instructors_re is not None:
+                if ctx.avoid_instructors_re.search(instructor):
+                    continue
+            elif any(avoid_inst in instructor for avoid_inst in ctx.avoid_instructors):
                 continue
                 
             # Check time constraints
-            if not cls._section_meets_time_constraints(section, earliest_start, latest_end, avoid_days):
+            if not cls._section_meets_time_constraints(section, ctx.earliest_min, ctx.latest_min, ctx.avoid_day_mask):
                 continue
             
-            # Calculate preference score
-            score = cls._calculate_section_score(section, time_constraints, instructor_preferences)
-            scored_sections.append((score, section))
+            candidates.append(section)
+        
+        # Calculate preference scores
+        scores = cls._calculate_section_scores(candidates, ctx)
         
-        # Sort by score (higher is better) and return the best
-        if scored_sections:
-            scored_sections.sort(key=lambda x: x[0], reverse=True)
-            return scored_sections[0][1]
+        # Single pass for the highest score (first one wins ties)
+        best_score, best_section = -math.inf, None
+        for score, section in zip(scores, candidates):
+            if score > best_score:
+                best_score, best_section = score, section
         
-        return None
+        return best_section
     
     @classmethod
-    def _section_meets_time_constraints(cls, section: Dict[str, Any], earliest_start: str, 
-                                      latest_end: str, avoid_days: List[str]) -> bool:
-        """Check if section meets time constraints"""
+    def _section_meets_time_constraints(cls, section: Dict[str, Any], earliest_min: Optional[int], 
+                                      latest_min: Optional[int], avoid_day_mask: int) -> bool:
+        """Check if section meets time constraints (bounds are minutes since midnight)"""
         try:
-            time_str = section.get('time', '')
-            days = section.get('days', [])
-            
             # Check days
-            if any(day.lower() in [d.lower() for d in days] for day in avoid_days):
+            if cls._section_day_mask(section) & avoid_day_mask:
                 return False
             
             # Check time range
-            if time_str and '-' in time_str:
-                times = cls._parse_time_string(time_str)
-                if times:
-                    start_time, end_time = times
-                    earliest = cls._parse_time_string(earliest_start + '-' + earliest_start)
-                    latest = cls._parse_time_string(latest_end + '-' + latest_end)
-                    
-                    if earliest and latest:
-                        if start_time < earliest[0] or end_time > latest[1]:
-                            return False
+            mins = cls._section_minutes(section)
+            if mins and earliest_min is not None and latest_min is not None:
+                start_min, end_min = mins
+                if start_min < earliest_min or end_min > latest_min:
+                    return False
             
             return True
             
@@ -894,37 +1082,32 @@ class ScheduleService:
             return True  # Default to allowing the section
     
     @classmethod 
-    def _calculate_section_score(cls, section: Dict[str, Any], time_constraints: Dict[str, Any], 
-                               instructor_preferences: Dict[str, Any]) -> float:
-        """Calculate a preference score for a section (higher is better)"""
-        score = 0.0
+    def _calculate_section_scores(cls, sections: List[Dict[str, Any]], ctx: SimpleNamespace) -> List[float]:
+        """Calculate preference scores for a batch of sections in one pass (higher is better)"""
+        preferred_buckets = ctx.preferred_buckets
         
-        try:
-            time_str = section.get('time', '')
-            preferred_times = time_constraints.get('preferred_times', [])
-            
-            # Score based on preferred times
-            if preferred_times and time_str:
-                for pref_time in preferred_times:
-                    if pref_time.lower() == 'morning' and any(t in time_str for t in ['08:', '09:', '10:', '11:']):
-                        score += 2.0
-                    elif pref_time.lower() == 'afternoon' and any(t in time_str for t in ['12:', '13:', '14:', '15:', '16:']):
-                        score += 2.0
-                    elif pref_time.lower() == 'evening' and any(t in time_str for t in ['17:', '18:', '19:', '20:']):
-                        score += 2.0
-            
+        scores = []
+        for section in sections:
             # Small bonus for non-conflicting sections
-            score += 1.0
-            
-            # Randomize slightly to get variety when regenerating
-            import random
-            score += random.uniform(0, 0.5)
-            
-        except Exception as e:
-            logger.warning(f"Error calculating section score: {e}")
             score = 1.0
+            try:
+                mins = cls._section_minutes(section)
+                
+                # Score based on preferred times, using the parsed start hour
+                if mins and preferred_buckets:
+                    start_hour = mins[0] // 60
+                    for from_hour, to_hour in preferred_buckets:
+                        if from_hour <= start_hour < to_hour:
+                            score += 2.0
+                
+            except Exception as e:
+                logger.warning(f"Error calculating section score: {e}")
+                score = 1.0
+            scores.append(score)
         
-        return score
+        # Randomize slightly to get variety when regenerating
+        rand = ctx.rng.random
+        return [score + rand() * 0.5 for score in scores]
 
     @classmethod
     def generate_alternative_schedule(cls, course_codes: List[str], term: str, 
@@ -1,5 +1,5 @@
-from django.urls import path, include
-from rest_framework.routers import DefaultRouter
+from django.urls import path, re_path, include
+from rest_framework.routers import SimpleRouter
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -30,72 +30,109 @@ from .views import (
     rmp_stats,
     ScheduleGenerationView, # Add ScheduleGenerationView import
     UserPreferencesView, # Add UserPreferencesView import
+    BatchRequestView,
 )
+from .utils import cached
 from .calendar_views import UserCalendarViewSet, export_ics, SharedScheduleViewSet, get_shared_schedule
 
 app_name = 'api'
 
-# Initialize the router
-router = DefaultRouter()
 
-# Register viewsets with the router
-router.register(r'dates', ImportantDateViewSet, basename='importantdate')
-router.register(r'exams', ExamEventViewSet, basename='examevent')
-router.register(r'courses', CourseViewSet, basename='course')
-router.register(r'user-calendar', UserCalendarViewSet, basename='user-calendar')
-router.register(r'shared-schedules', SharedScheduleViewSet, basename='shared-schedule')
+# ViewSets, keyed by URL prefix. Each gets its own SimpleRouter registered at an
+# empty prefix and is mounted under path(prefix, include(...)), so one prefix
+# match skips a viewset's list/detail/action regexes. SimpleRouter rather than
+# DefaultRouter: no browsable API root view and no .json/.api format-suffix variants.
+viewsets = [
+    ('dates/', ImportantDateViewSet, 'importantdate'),
+    ('exams/', ExamEventViewSet, 'examevent'),
+    ('courses/', CourseViewSet, 'course'),
+    ('user-calendar/', UserCalendarViewSet, 'user-calendar'),
+    ('shared-schedules/', SharedScheduleViewSet, 'shared-schedule'),
+]
 
 
-urlpatterns = [
-    path('auth/register/', UserRegistrationView.as_view(), name='user-register'),
-    path('auth/login/', UserLoginView.as_view(), name='user-login'), # Custom login view
-    # Slashless aliases to avoid 405 when client omits trailing slash
-    path('auth/login', UserLoginView.as_view(), name='user-login-no-slash'),
-    path('auth/guest-login/', GuestLoginView.as_view(), name='guest-login'), # Guest login
-    path('auth/guest-login', GuestLoginView.as_view(), name='guest-login-no-slash'),
-    path('health/', HealthCheckView.as_view(), name='health-check'), # Health check
-    path('health', HealthCheckView.as_view(), name='health-check-no-slash'),
-    path('auth/token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
-    path('profile/', UserProfileView.as_view(), name='profile'),
-    path('auth/profile/update/', UserProfileUpdateView.as_view(), name='profile-update'),
-    path('auth/password-reset/request/', PasswordResetRequestView.as_view(), name='password-reset-request'),
-    path('auth/password-reset/confirm/', PasswordResetConfirmView.as_view(), name='password-reset-confirm'),
+def viewset_patterns(viewset, basename):
+    router = SimpleRouter()
+    router.register('', viewset, basename=basename)
+    # A list: include() reads a tuple as (patterns, app_name)
+    return list(router.urls)
+
+
+# Routes are grouped by prefix with include() so the resolver skips a whole
+# subtree when its prefix doesn't match instead of testing every pattern in turn.
+auth_patterns = [
+    path('register/', UserRegistrationView.as_view(), name='user-register'),
+    # Optional trailing slash avoids a 405 when the client omits it; APPEND_SLASH
+    # can't cover these because CommonMiddleware won't redirect a POST
+    re_path(r'^login/?$', UserLoginView.as_view(), name='user-login'), # Custom login view
+    re_path(r'^guest-login/?$', GuestLoginView.as_view(), name='guest-login'), # Guest login
+    path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
+    path('profile/update/', UserProfileUpdateView.as_view(), name='profile-update'),
+    path('password-reset/request/', PasswordResetRequestView.as_view(), name='password-reset-request'),
+    path('password-reset/confirm/', PasswordResetConfirmView.as_view(), name='password-reset-confirm'),
+]
+
+ai_patterns = [
     # AI Chat URL - handle both with and without ID
-    path('ai/chat/', MessageView.as_view(), name='ai-chat'),
-    path('ai/chat/<int:id>/', MessageView.as_view(), name='ai-chat-with-id'),
+    path('chat/', MessageView.as_view(), name='ai-chat'),
+    path('chat/<int:id>/', MessageView.as_view(), name='ai-chat-with-id'),
     # AI Intent Detection URL
-    path('ai/intent/', IntentDetectionView.as_view(), name='ai-intent'),
+    path('intent/', IntentDetectionView.as_view(), name='ai-intent'),
     # AI Classification URL
-    path('ai/classify/', AIClassificationView.as_view(), name='ai-classify'),
+    path('classify/', AIClassificationView.as_view(), name='ai-classify'),
+]
+
+schedule_patterns = [
     # Schedule Generation URL
-    path('schedule/generate/', ScheduleGenerationView.as_view(), name='schedule-generate'),
-    path('health-check/', HealthCheckView.as_view(), name='health-check-dup'), # Add this line
-    path('health-check', HealthCheckView.as_view(), name='health-check-no-slash'),
+    path('generate/', ScheduleGenerationView.as_view(), name='schedule-generate'),
+    # Shared Schedule URL (public endpoint)
+    path('<uuid:schedule_id>/', get_shared_schedule, name='shared-schedule-view'),
+]
+
+calendar_patterns = [
     # Calendar Events URL
-    path('calendar/events/', CalendarEventListCreateView.as_view(), name='calendar-events'),
-    path('calendar/events/<int:pk>/', CalendarEventRetrieveUpdateDestroyView.as_view(), name='calendar-event-detail'),
+    path('events/', CalendarEventListCreateView.as_view(), name='calendar-events'),
+    path('events/<int:pk>/', CalendarEventRetrieveUpdateDestroyView.as_view(), name='calendar-event-detail'),
     # Calendar Export URL
-    path('calendar/export_ics/', export_ics, name='calendar-export-ics'),
-    # Shared Schedule URL (public endpoint)
-    path('schedule/<uuid:schedule_id>/', get_shared_schedule, name='shared-schedule-view'),
-    # Contact Email URL
-    path('contact/send/', ContactEmailView.as_view(), name='contact-send'),
-    # Course Data API
-    path('data/courses-complete/', CourseDataView.as_view(), name='courses-complete'),
-    
-    # RMP Data APIs
-    path('professors/rmp/', professor_rmp_data, name='professor-rmp-data'),
-    path('professors/search/', professor_search, name='professor-search'),
-    path('rmp/stats/', rmp_stats, name='rmp-stats'),
+    path('export_ics/', export_ics, name='calendar-export-ics'),
+]
 
+professor_patterns = [
+    # RMP Data APIs
+    path('rmp/', cached(professor_rmp_data, ttl=300), name='professor-rmp-data'),
+    # Not cached: every free-text query string would get its own entry
+    path('search/', professor_search, name='professor-search'),
     # Professor Sync URL
-    path('professors/sync/', ProfessorSyncView.as_view(), name='professor-sync'),
-    path('professors/auto-sync/', ProfessorAutoSyncView.as_view(), name='professor-auto-sync'),
+    path('sync/', ProfessorSyncView.as_view(), name='professor-sync'),
+    path('auto-sync/', ProfessorAutoSyncView.as_view(), name='professor-auto-sync'),
+]
 
+user_preferences_patterns = [
     # User Preferences URLs
-    path('user-preferences/', UserPreferencesView.as_view(), name='user-preferences'),
-    path('user-preferences/<str:key>/', UserPreferencesView.as_view(), name='user-preferences-key'),
+    path('', UserPreferencesView.as_view(), name='user-preferences'),
+    path('<str:key>/', UserPreferencesView.as_view(), name='user-preferences-key'),
+]
+
+urlpatterns = [
+    # Health check: health, health-check, each with or without the slash. First in the
+    # list so load balancer probes resolve on the first pattern tried.
+    re_path(r'^health(?:-check)?/?$', HealthCheckView.as_view(), name='health-check'),
+    path('auth/', include(auth_patterns)),
+    path('profile/', UserProfileView.as_view(), name='profile'),
+    path('ai/', include(ai_patterns)),
+    path('schedule/', include(schedule_patterns)),
+    path('calendar/', include(calendar_patterns)),
+    # Contact Email URL
+    path('contact/send/', ContactEmailView.as_view(), name='contact-send'),
+    # Course Data API
+    # Reference data endpoints serve read-mostly files, so their GET responses are cached
+    path('data/courses-complete/', cached(CourseDataView.as_view(), ttl=300), name='courses-complete'),
+    path('professors/', include(professor_patterns)),
+    path('rmp/stats/', cached(rmp_stats, ttl=60), name='rmp-stats'),
+    # Several read-only API GETs in one round trip
+    path('batch/', BatchRequestView.as_view(), name='batch'),
+    path('user-preferences/', include(user_preferences_patterns)),
 
-    # Add the router URLs to the urlpatterns
-    path('', include(router.urls)),
+    # ViewSet routes
+    *(path(prefix, include(viewset_patterns(viewset, basename))) for prefix, viewset, basename in viewsets),
 ]
@@ -1,7 +1,12 @@
+import hashlib
+import json
 import logging
-from typing import Any, Dict
+import time
+from functools import wraps
+from typing import Any, Callable, Dict
 from django.conf import settings
-from django.http import JsonResponse
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
 from rest_framework import status
 from rest_framework.exceptions import (
     AuthenticationFailed,
@@ -10,11 +15,52 @@ from rest_framework.exceptions import (
     ValidationError,
     Throttled,
 )
+from rest_framework.throttling import ScopedRateThrottle
 from rest_framework.views import exception_handler
 from rest_framework.response import Response
 
 logger = logging.getLogger(__name__)
 
+# DEBUG never changes in a running process; read it once instead of through
+# LazySettings on every handled exception
+_DEBUG = bool(getattr(settings, 'DEBUG', False))
+
+# Public frontend origin for links handed back to clients; fixed for the process
+_SITE_URL = settings.SITE_URL.rstrip('/')
+
+# Log level and message for the DRF exceptions log_error reports on their own
+_EXC_LOG = {
+    Throttled: (logging.WARNING, "Rate limit exceeded in %s: %s"),
+    AuthenticationFailed: (logging.WARNING, "Authentication failed in %s: %s"),
+    PermissionDenied: (logging.WARNING, "Permission denied in %s: %s"),
+    ValidationError: (logging.INFO, "Validation error in %s: %s"),
+}
+
+# Request/log keys whose values are never written to logs
+_SENSITIVE_FIELDS = frozenset(('password', 'token', 'key', 'secret', 'api_key'))
+
+
+def _view_name(context: Dict[str, Any]) -> str:
+    """
+    Class name of the view in a DRF exception context
+    """
+    # context['view'] is a view instance, not a dict, so read its type directly
+    view = context.get('view')
+    return type(view).__name__ if view is not None else 'Unknown'
+
+
+def _build_debug_info(exc: Exception, context: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Debug details attached to error responses in development
+    """
+    request = context.get('request')
+    return {
+        'exception_type': type(exc).__name__,
+        'view': _view_name(context),
+        'request_method': request.method if request is not None else 'Unknown',
+        'request_path': request.path if request is not None else 'Unknown',
+    }
+
 
 def custom_exception_handler(exc: Exception, context: Dict[str, Any]) -> Response:
     """
@@ -25,13 +71,8 @@ def custom_exception_handler(exc: Exception, context: Dict[str, Any]) -> Respons
 
     if response is not None:
         # Add additional error information for debugging in development
-        if settings.DEBUG:
-            response.data['debug_info'] = {
-                'exception_type': type(exc).__name__,
-                'view': context.get('view', {}).get('__class__', {}).get('__name__', 'Unknown'),
-                'request_method': context.get('request', {}).method if 'request' in context else 'Unknown',
-                'request_path': context.get('request', {}).path if 'request' in context else 'Unknown',
-            }
+        if _DEBUG:
+            response.data['debug_info'] = _build_debug_info(exc, context)
 
         # Log errors for monitoring
         log_error(exc, context, response.status_code)
@@ -40,8 +81,8 @@ def custom_exception_handler(exc: Exception, context: Dict[str, Any]) -> Respons
 
     # Handle unhandled exceptions
     logger.error(
-        f"Unhandled exception in {context.get('view', {}).get('__class__', {}).get('__name__', 'Unknown')}: "
-        f"{type(exc).__name__}: {str(exc)}",
+        "Unhandled exception in %s: %s: %s",
+        _view_name(context), type(exc).__name__, exc,
         exc_info=True
     )
 
@@ -58,36 +99,33 @@ def log_error(exc: Exception, context: Dict[str, Any], status_code: int) -> None
     """
     Log errors for monitoring and debugging
     """
-    view_name = context.get('view', {}).get('__class__', {}).get('__name__', 'Unknown')
-    request = context.get('request')
+    view_name = _view_name(context)
+
+    # %-style arguments: str(exc) only runs if a handler actually emits the record.
+    # Walking the MRO keeps isinstance semantics for subclasses; the exact class hits first.
+    for exc_class in type(exc).__mro__:
+        entry = _EXC_LOG.get(exc_class)
+        if entry is not None:
+            level, message = entry
+            logger.log(level, message, view_name, exc)
+            return
 
-    if isinstance(exc, Throttled):
-        logger.warning(f"Rate limit exceeded in {view_name}: {str(exc)}")
-    elif isinstance(exc, AuthenticationFailed):
-        logger.warning(f"Authentication failed in {view_name}: {str(exc)}")
-    elif isinstance(exc, PermissionDenied):
-        logger.warning(f"Permission denied in {view_name}: {str(exc)}")
-    elif isinstance(exc, ValidationError):
-        logger.info(f"Validation error in {view_name}: {str(exc)}")
-    elif status_code >= 500:
+    if status_code >= 500:
         logger.error(
-            f"Server error in {view_name}: {type(exc).__name__}: {str(exc)}",
+            "Server error in %s: %s: %s", view_name, type(exc).__name__, exc,
             exc_info=True
         )
     elif status_code >= 400:
-        logger.info(f"Client error in {view_name}: {type(exc).__name__}: {str(exc)}")
+        logger.info("Client error in %s: %s: %s", view_name, type(exc).__name__, exc)
 
 
 def validate_request_data(request, required_fields: list) -> Dict[str, Any]:
     """
     Validate that required fields are present in request data
     """
-    data = request.data if hasattr(request, 'data') else {}
-    missing_fields = []
-
-    for field in required_fields:
-        if field not in data or not data[field]:
-            missing_fields.append(field)
+    data = getattr(request, 'data', {})
+    # One dict.get per field: absent and empty values both count as missing
+    missing_fields = [field for field in required_fields if not data.get(field)]
 
     if missing_fields:
         raise ValidationError(f"Missing required fields: {', '.join(missing_fields)}")
@@ -99,16 +137,21 @@ def sanitize_log_data(data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Remove sensitive information from log data
     """
-    sensitive_fields = ['password', 'token', 'key', 'secret', 'api_key']
-    sanitized = data.copy()
+    sanitized = dict(data)
 
-    for field in sensitive_fields:
-        if field in sanitized:
-            sanitized[field] = '***REDACTED***'
+    for field in _SENSITIVE_FIELDS & sanitized.keys():
+        sanitized[field] = '***REDACTED***'
 
     return sanitized
 
 
+def build_url(path: str) -> str:
+    """
+    Absolute frontend URL for path (which starts with '/'), without a request or reverse()
+    """
+    return f"{_SITE_URL}{path}"
+
+
 class RateLimitMixin:
     """
     Mixin to add rate limiting to views
@@ -116,11 +159,123 @@ class RateLimitMixin:
     throttle_scope = None
 
     def get_throttles(self):
-        throttles = super().get_throttles() if hasattr(super(), 'get_throttles') else []
+        # The throttle classes are fixed per view class, so resolve them once and
+        # keep them on that class (not a base, hence __dict__). Instances still
+        # have to be fresh each request: throttles hold per-request state.
+        cls = type(self)
+        throttle_classes = cls.__dict__.get('_throttle_classes')
+        if throttle_classes is None:
+            throttle_classes = tuple(getattr(self, 'throttle_classes', ()))
+            if self.throttle_scope:
+                throttle_classes += (ScopedRateThrottle,)
+            cls._throttle_classes = throttle_classes
+
+        return [throttle() for throttle in throttle_classes]
 
-        if self.throttle_scope:
-            from rest_framework.throttling import ScopedRateThrottle
-            throttles.append(ScopedRateThrottle())
 
-        return throttles
+class AIResponseCacheMixin:
+    """
+    Mixin to cache successful responses of deterministic AI endpoints, keyed by request body
+    """
+    def dispatch(self, request, *args, **kwargs):
+        ttl = getattr(settings, 'AI_CACHE_TTL', 3600)
+        if request.method != 'POST' or not getattr(settings, 'AI_CACHE_ENABLED', True) or ttl <= 0:
+            return super().dispatch(request, *args, **kwargs)
+
+        # Canonical JSON so key order and whitespace in the body don't split the cache
+        try:
+            body = json.dumps(json.loads(request.body), sort_keys=True).encode('utf-8')
+        except ValueError:
+            body = request.body
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        key = f"ai:{type(self).__name__}:{digest}"
+
+        data = cache.get(key)
+        if data is not None:
+            response = JsonResponse(data, safe=False)
+            response['X-AI-Cache'] = 'hit'
+            return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK and hasattr(response, 'data'):
+            cache.set(key, response.data, ttl)
+            response['X-AI-Cache'] = 'miss'
+        return response
+
+
+class ValuesListMixin:
+    """
+    Mixin for ModelViewSets whose serializer only lists plain model fields: list()
+    reads those fields with queryset.values() instead of building model instances
+    and running every field's to_representation. The JSON renderer formats
+    dates and times the same way the serializer fields would.
+    """
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.values(*self.get_serializer_class().Meta.fields)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(list(rows))
+
+
+def _response_cache_key(request) -> str:
+    # hashlib rather than hash(): str hashes are salted per process, and the
+    # key has to agree across workers sharing the cache. DRF views negotiate the
+    # renderer from Accept, so it is part of the key alongside the path.
+    vary = f"{request.get_full_path()}\n{request.META.get('HTTP_ACCEPT', '')}"
+    digest = hashlib.md5(vary.encode('utf-8')).hexdigest()
+    return f"resp:{digest}"
+
+
+def _cached_response(entry, cache_status: str) -> HttpResponse:
+    response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['X-Cache'] = cache_status
+    return response
+
+
+def cached(view: Callable, ttl: int = 30, stale_ttl: int = 10 * 60) -> Callable:
+    """
+    Cache successful JSON GET responses of a view for ttl seconds, keyed by path, query string
+    and Accept header; other content types (e.g. the browsable API's HTML) are never stored.
+    Entries are kept for stale_ttl seconds so that, once expired, they can still stand in
+    when the view raises or answers 5xx. Only for endpoints whose response doesn't depend on the user,
+    and not for free-text search, where each query string would add a key.
+    """
+    @wraps(view)
+    def cached_view(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+
+        key = _response_cache_key(request)
+        entry = cache.get(key)
+        if entry is not None and time.time() < entry['fresh_until']:
+            return _cached_response(entry, 'hit')
+
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            if entry is None:
+                raise
+            logger.exception("Serving stale cached response for %s", request.path)
+            return _cached_response(entry, 'stale-fallback')
+
+        if response.status_code >= 500 and entry is not None:
+            logger.warning("Serving stale cached response for %s after a %s", request.path, response.status_code)
+            return _cached_response(entry, 'stale-fallback')
+
+        if response.status_code == status.HTTP_200_OK:
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            if not response.get('Content-Type', '').startswith('application/json'):
+                return response
+            cache.set(key, {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'fresh_until': time.time() + ttl,
+            }, stale_ttl)
+            response['X-Cache'] = 'miss'
+        return response
 
+    return cached_view
@@ -6,6 +6,8 @@ import openai # Potentially: from openai import OpenAI
 import requests
 import json
 import random
+import re
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin
 from django.utils import timezone
 
@@ -15,6 +17,7 @@ from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.core.mail import send_mail
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.db.models import Q 
 
 from rest_framework import serializers, status, generics
@@ -36,78 +39,141 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from .models import Message, CalendarEvent, ImportantDate, ExamEvent, Course # Import the Message and CalendarEvent models
 from .serializers import CalendarEventSerializer, ImportantDateSerializer, ExamEventSerializer, CourseSerializer
 from .services.schedule_generator_service import ScheduleGeneratorService # Import the CalendarEventSerializer
+from .utils import AIResponseCacheMixin, ValuesListMixin
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
+# --- Professor / RMP detection patterns ---
+# Compiled once at import; MessageView runs these on every chat message.
+
+# Phrases that mean "help me with RMP" without naming a professor
+_GENERAL_RMP_KEYWORDS = (
+    'help me find a prof on rmp',
+    'help me find a professor on rmp',
+    'find a prof on rmp',
+    'find a professor on rmp',
+    'help me find rmp',
+    'find rmp for',
+    'rmp search',
+    'rate my professor search',
+    'help with rmp',
+    'can you help me find a prof',
+    'can you help me find a professor',
+    'help me look up a prof',
+    'help me look up a professor',
+)
+
+# Tried in order; the last (bare capitalized name) only counts with professor context
+_PROFESSOR_NAME_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    # Patterns with explicit professor keywords
+    # "help me find RMP for Prof Vida" or "find RMP for Professor Smith"
+    r'(?:rmp|rate my professor|rating|review).*?(?:for|of)\s+(?:professor|prof\.?|dr\.?|doctor)\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
+    # "Professor John Smith" or "Prof John Smith" - captures multiple names
+    r'(?:professor|prof\.?|dr\.?|doctor)\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
+    # "John Smith" after phrases like "about", "tell me about", "who is", "find", "search"
+    r'(?:about|tell me about|who is|find|search|for)\s+(?:professor|prof\.?|dr\.?|doctor)?\s*([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
+    # "Prof. Smith" or "Dr. Smith" - single or multiple names
+    r'(?:prof\.?|dr\.?)\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
+    # Names in quotes
+    r'["\']([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)["\']',
+    # Capitalized names that appear after professor keywords (broader search)
+    r'(?:professor|prof\.?|dr\.?|doctor|instructor|teacher).*?([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
+    # "Prof Vida" or "Dr Smith" (no period, common casual usage)
+    r'(?:prof|dr|professor|doctor)\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
+    # "help me find a RMP for Vida" - name without title
+    r'(?:rmp|rate my professor|rating|review).*?(?:for|of)\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
+    # "give me for prof wassim" - casual requests
+    r'(?:give me|get me|find|search).*?(?:for|about)\s+(?:prof\.?|professor|dr\.?|doctor)\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
+
+    # Patterns that work without professor keywords
+    # "RMP for Nour" or "find RMP for Smith"
+    r'(?:rmp|rate my professor|rating|review).*?(?:for|of)\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
+    # Capitalized names that appear after context words
+    r'(?:about|tell me about|who is|find|search for|looking for|get|need)\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
+    # Simple pattern: just a capitalized name (but be careful - only if it looks like a professor context)
+    r'\b([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)\b',
+))
+
+_PROFESSOR_NAME_VALID_RE = re.compile(r'^[A-Za-z\s\.]+$')
+
+# Words that make a bare capitalized name count as a professor name
+_PROFESSOR_CONTEXT_KEYWORDS = (
+    'professor', 'prof', 'dr.', 'doctor', 'instructor', 'teacher',
+    'prof.', 'proffesor', 'proffessor', 'rmp', 'rate my professor',
+    'rating', 'review', 'grade', 'grading', 'teaches', 'taught',
+)
+
 # --- Utility Functions ---
 
+# Greeting templates; only the name changes between calls
+_FUNNY_MESSAGE_TEMPLATES = (
+    "{name}: The sequel nobody asked for",
+    "{name} has emerged from their cave",
+    "{name}: Grand reopening today",
+    "{name} discovered sunlight still exists",
+    "{name}: Migration season begins",
+    "{name} earned: 'Back to Reality' badge",
+    "{name}: Coming off the bench strong",
+    "{name} has re-entered Earth's atmosphere",
+    "{name}: Finally done marinating",
+    "Today's forecast: 100% chance of {name}",
+    "{name}: The Phoenix rises",
+    "{name}: No longer in bear hibernation",
+    "{name}: Extended hours in effect",
+    "{name} completed: Basic Consciousness Tutorial",
+    "The legend {name} has awakened",
+    "{name}: Rookie of the afternoon",
+    "{name}'s internal timer finally went off",
+    "{name} pressure system moving in",
+    "{name}: Operating in a different timezone",
+    "{name}: Houston, we have consciousness",
+    "{name}: Back in stock",
+    "{name}: Alpha of the afternoon pack",
+    "{name} unlocked: Functional Human Status",
+    "{name}: Director's cut now playing",
+    "{name}: Fashionably late since birth",
+    "{name} enters the game in the 4th quarter",
+    "{name} has left the oven (bed) after 8 hours",
+    "{name} front approaching fast",
+    "{name}: Return of the King",
+    "{name}'s orbit has stabilized",
+    "Breaking news: {name} shows signs of life",
+    "{name}: Now open for business",
+    "{name}: The sleeping giant awakens",
+    "{name} achieved: Vertical Position Mastery",
+    "{name}'s morning started this evening",
+    "{name}: Clutch performance in overtime",
+    "{name} has finished slow-cooking their consciousness",
+    "Current conditions: Peak {name} energy",
+    "{name} finally synced with Earth time",
+    "{name}: Alien life form detected",
+    "The prophecy is fulfilled - {name} awakens",
+    "{name}: Customer service now available",
+    "{name}: Nocturnal creature adapting",
+    "{name} leveled up to 'Awake'",
+    "{name} has left the Matrix",
+    "{name} storm warning in effect",
+    "{name}'s internal clock runs on island time",
+    "{name}: MVP of late starts",
+    "{name}: No longer in hibernation mode",
+    "{name} visibility: Now crystal clear",
+    "{name} emerges from the void",
+    "{name}: Solar panels finally charging",
+    "Alert: {name} has entered the building",
+    "{name} obtained: Eye Opening Powers",
+    "{name}: Resurrection complete",
+    "{name} levels are rising steadily",
+    "{name} rises from the ashes",
+    "{name}: Gravity has been restored",
+    "{name}: Achievement unlocked - Join Society",
+    "{name}: Back from the dead",
+)
+
+
 def get_random_funny_message(user_name):
     """Get a random funny personalized message for the user"""
-    funny_messages = [
-        f"{user_name}: The sequel nobody asked for",
-        f"{user_name} has emerged from their cave",
-        f"{user_name}: Grand reopening today",
-        f"{user_name} discovered sunlight still exists",
-        f"{user_name}: Migration season begins",
-        f"{user_name} earned: 'Back to Reality' badge",
-        f"{user_name}: Coming off the bench strong",
-        f"{user_name} has re-entered Earth's atmosphere",
-        f"{user_name}: Finally done marinating",
-        f"Today's forecast: 100% chance of {user_name}",
-        f"{user_name}: The Phoenix rises",
-        f"{user_name}: No longer in bear hibernation",
-        f"{user_name}: Extended hours in effect",
-        f"{user_name} completed: Basic Consciousness Tutorial",
-        f"The legend {user_name} has awakened",
-        f"{user_name}: Rookie of the afternoon",
-        f"{user_name}'s internal timer finally went off",
-        f"{user_name} pressure system moving in",
-        f"{user_name}: Operating in a different timezone",
-        f"{user_name}: Houston, we have consciousness",
-        f"{user_name}: Back in stock",
-        f"{user_name}: Alpha of the afternoon pack",
-        f"{user_name} unlocked: Functional Human Status",
-        f"{user_name}: Director's cut now playing",
-        f"{user_name}: Fashionably late since birth",
-        f"{user_name} enters the game in the 4th quarter",
-        f"{user_name} has left the oven (bed) after 8 hours",
-        f"{user_name} front approaching fast",
-        f"{user_name}: Return of the King",
-        f"{user_name}'s orbit has stabilized",
-        f"Breaking news: {user_name} shows signs of life",
-        f"{user_name}: Now open for business",
-        f"{user_name}: The sleeping giant awakens",
-        f"{user_name} achieved: Vertical Position Mastery",
-        f"{user_name}'s morning started this evening",
-        f"{user_name}: Clutch performance in overtime",
-        f"{user_name} has finished slow-cooking their consciousness",
-        f"Current conditions: Peak {user_name} energy",
-        f"{user_name} finally synced with Earth time",
-        f"{user_name}: Alien life form detected",
-        f"The prophecy is fulfilled - {user_name} awakens",
-        f"{user_name}: Customer service now available",
-        f"{user_name}: Nocturnal creature adapting",
-        f"{user_name} leveled up to 'Awake'",
-        f"{user_name} has left the Matrix",
-        f"{user_name} storm warning in effect",
-        f"{user_name}'s internal clock runs on island time",
-        f"{user_name}: MVP of late starts",
-        f"{user_name}: No longer in hibernation mode",
-        f"{user_name} visibility: Now crystal clear",
-        f"{user_name} emerges from the void",
-        f"{user_name}: Solar panels finally charging",
-        f"Alert: {user_name} has entered the building",
-        f"{user_name} obtained: Eye Opening Powers",
-        f"{user_name}: Resurrection complete",
-        f"{user_name} levels are rising steadily",
-        f"{user_name} rises from the ashes",
-        f"{user_name}: Gravity has been restored",
-        f"{user_name}: Achievement unlocked - Join Society",
-        f"{user_name}: Back from the dead"
-    ]
-    
-    return random.choice(funny_messages)
+    return random.choice(_FUNNY_MESSAGE_TEMPLATES).format(name=user_name)
 
 # --- Health Check View ---
 
@@ -122,6 +188,8 @@ class HealthCheckView(APIView):
 # --- User Registration ---
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
+    USERNAME_ATTEMPTS = 3  # Tries at creating the user under a generated username
+
     password = serializers.CharField(write_only=True, required=True, style={'input_type': 'password'})
     email = serializers.EmailField(required=True)
     username = serializers.CharField(required=False, allow_blank=True)
@@ -144,6 +212,16 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("This username is already taken.")
         return value
         
+    def _free_username(self, base_username):
+        """base_username, or base_username1, 2, ... whichever is free, from one query"""
+        taken = set(User.objects.filter(username__startswith=base_username).values_list('username', flat=True))
+        username = base_username
+        counter = 1
+        while username in taken:
+            username = f"{base_username}{counter}"
+            counter += 1
+        return username
+
     def create(self, validated_data):
         # Extract optional fields
         program = validated_data.pop('program', '')
@@ -153,21 +231,28 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         if provided_username:
             username = provided_username
         else:
-            email = validated_data['email']
-            base_username = email.split('@')[0]
-            username = base_username
-            counter = 1
-            while User.objects.filter(username=username).exists():
-                username = f"{base_username}{counter}"
-                counter += 1
-
-        user = User.objects.create_user(
-            username=username,
-            email=validated_data['email'],
-            password=validated_data['password'],
-            first_name=validated_data.get('first_name', ''),
-            last_name=validated_data.get('last_name', '')
-        )
+            base_username = validated_data['email'].split('@')[0]
+            username = self._free_username(base_username)
+
+        for attempt in range(1, self.USERNAME_ATTEMPTS + 1):
+            try:
+                # Savepoint, so a lost race leaves the outer transaction usable
+                with transaction.atomic():
+                    user = User.objects.create_user(
+                        username=username,
+                        email=validated_data['email'],
+                        password=validated_data['password'],
+                        first_name=validated_data.get('first_name', ''),
+                        last_name=validated_data.get('last_name', '')
+                    )
+                break
+            except IntegrityError:
+                # A concurrent registration took the generated name; pick the next free one.
+                # Bounded, since errors from the profile signals surface here too and
+                # would otherwise keep retrying the same free name.
+                if provided_username or attempt == self.USERNAME_ATTEMPTS:
+                    raise
+                username = self._free_username(base_username)
         
         # Update UserProfile with program information (UserProfile is auto-created by signal)
         try:
@@ -256,8 +341,12 @@ class UserProfileSerializer(serializers.ModelSerializer):
         
         # Update or create profile with program
         if program is not None or banner_style is not None or profile_mode is not None:
-            from .models import UserProfile
-            profile, created = UserProfile.objects.get_or_create(user=instance)
+            # Update the profile the response is built from (joined in at authentication),
+            # not a second copy that to_representation wouldn't see
+            try:
+                profile = instance.profile
+            except UserProfile.DoesNotExist:
+                profile, created = UserProfile.objects.get_or_create(user=instance)
             if program is not None:
                 profile.program = program
             if banner_style is not None:
@@ -269,7 +358,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
         return instance
 
 class UserProfileView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = User.objects.all()
+    queryset = User.objects.select_related('profile')
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated]
 
@@ -397,54 +486,128 @@ class MessageInputSerializer(serializers.Serializer):
         # For now, basic format validation by UUIDField is sufficient.
         return value
 
+# The whole message has to be a reset command ("reset chat history", "start over",
+# "new conversation"), so questions that merely use these words don't wipe a session
+_RESET_REQUEST_RE = re.compile(
+    r"^\W*(?:(?:please|pls|can you|could you|let'?s)\s+)*"
+    r"(?:(?:reset|clear|restart|wipe|erase)(?:\s+(?:the|this|our|my))?"
+    r"(?:\s+(?:chat|conversation|session|history|context|memory)){0,2}"
+    r"|new\s+(?:chat|conversation|session)"
+    r"|start\s+(?:over|fresh|a\s+new\s+(?:chat|conversation|session))"
+    r"|forget\s+(?:everything|all\s+(?:of\s+)?that|(?:the|this|our)\s+(?:chat|conversation|context)))"
+    r"(?:\s+please)?\W*$",
+    re.IGNORECASE,
+)
+# Reset vocabulary anywhere in the message; a hit the strict pattern rejects is ambiguous
+_RESET_HINT_RE = re.compile(r"\b(?:reset|clear|restart|start over|forget|new (?:chat|conversation|session))\b", re.IGNORECASE)
+
+# Course codes like CSI2132, CSI 2132, CSI-2132, csi_2132 (matched against the
+# upper-cased message): 3-4 letters, optional separator, 3-4 digits, optional letter
+_COURSE_CODE_RE = re.compile(r'\b([A-Z]{3,4})[\s_-]?(\d{3,4})([A-Z]?)\b')
+
+_COURSE_INFO_KEYWORDS = (
+    'tell me about', 'what is', 'describe', 'info about', 'information about',
+    'course description', 'course info', 'about the course', 'about this course',
+    'details about', 'what\'s', 'whats', 'course details', 'overview of',
+    'summary of', 'explain', 'breakdown of', 'rundown of',
+    # Enhanced patterns for more natural queries
+    'what does', 'what do you know about', 'give me info on', 'give me information on',
+    'tell me what', 'can you tell me about', 'i want to know about',
+    'i need info on', 'i need information about', 'help me understand',
+    'what can you tell me about', 'what course is', 'what kind of course is',
+    'what subject is', 'what\'s covered in', 'whats covered in',
+    'what do they teach in', 'what will i learn in', 'what topics are covered',
+    'course content', 'course material', 'what\'s taught in', 'whats taught in',
+    'course outline', 'syllabus', 'curriculum', 'what are they about',
+    # Subject-specific queries
+    'about', 'is about', 'covers', 'teaches', 'focuses on',
+    # Question patterns
+    'how would you describe', 'can you describe', 'explain what',
+    'what kind of', 'what type of', 'what sort of'
+)
+
+# Any keyword as a substring, case-insensitively, in a single pass over the message
+_COURSE_INFO_KEYWORD_RE = re.compile('|'.join(map(re.escape, _COURSE_INFO_KEYWORDS)), re.IGNORECASE)
+
+# Pattern for course codes (3-4 letters + 3-4 digits, case insensitive)
+_COURSE_INFO_CODE = r'\b[A-Z]{3,4}\s?\d{3,4}[A-Z]?\b'
+
+# Enhanced patterns for course information queries
+_COURSE_INFO_RES = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    # "What is CSI 2110?" / "What's MAT 1320?"
+    rf'what\'?s?\s+({_COURSE_INFO_CODE})',
+    rf'({_COURSE_INFO_CODE})\s+is\s+about',
+    rf'about\s+({_COURSE_INFO_CODE})',
+    # "CSI 2110 about" / "tell me CSI 2110"
+    rf'({_COURSE_INFO_CODE})\s+(about|info|information|details)',
+    rf'(tell|give)\s+me\s+({_COURSE_INFO_CODE})',
+    # "What does CSI 2110 cover?" / "What do they teach in MAT 1320?"
+    rf'what\s+(does?|do|will)\s+({_COURSE_INFO_CODE})\s+(cover|teach|focus)',
+    rf'what\s+(does?|do|will)\s+.*\s+teach\s+in\s+({_COURSE_INFO_CODE})',
+    # "What's CSI 2110 all about?" / "What is MAT 1320 like?"
+    rf'what\'?s?\s+({_COURSE_INFO_CODE})\s+.*(about|like)',
+    rf'({_COURSE_INFO_CODE})\s+.*(course|class|subject)',
+    # Course description specific patterns
+    rf'description\s+(of\s+)?({_COURSE_INFO_CODE})',
+    rf'({_COURSE_INFO_CODE})\s+description',
+    # General inquiry patterns
+    rf'know\s+about\s+({_COURSE_INFO_CODE})',
+    rf'({_COURSE_INFO_CODE})\s+(overview|summary|breakdown)',
+    # Content-focused queries
+    rf'what.*covered.*({_COURSE_INFO_CODE})',
+    rf'({_COURSE_INFO_CODE}).*covered',
+    rf'topics.*({_COURSE_INFO_CODE})',
+    rf'({_COURSE_INFO_CODE}).*topics'
+))
+
+# "1000 level", "2000-level", "level 3000", "4000 courses"; matched against the lowercased message
+_COURSE_LEVEL_RES = tuple(re.compile(pattern) for pattern in (
+    r'\b([1-4])000\s*level\b',
+    r'\b([1-4])000[-\s]*level\b',
+    r'\blevel\s*([1-4])000\b',
+    r'\b([1-4])000\s*courses?\b',
+    r'\b([1-4])000[-\s]*courses?\b'
+))
+
+_CONTEXT_EMOJI = {'course': '📚', 'general': '📝'}
+
 class MessageView(APIView):
     permission_classes = [IsAuthenticated]
     MAX_HISTORY_MESSAGES = 20  # Increased from 10 - Maximum number of message pairs to include for better memory
     SESSION_EXPIRY_DAYS = 14   # Increased from 7 - Session expiry in days for better continuity
+    # Expired messages are purged nightly by `manage.py purge_expired_messages`; a small share of
+    # chat requests also trims the user's own backlog, one bounded batch at a time
+    CLEANUP_SAMPLE_RATE = 0.01
+    CLEANUP_BATCH_SIZE = 1000
     MIN_CONTEXT_MESSAGES = 5   # Minimum number of message pairs to include for context
     
     # AI-generated emojis - no hardcoded lists
+
+    def _get_openai_client(self, api_key):
+        """One OpenAI client per request, so its calls share pooled connections"""
+        client = getattr(self, '_openai_client', None)
+        if client is None:
+            client = self._openai_client = openai.OpenAI(api_key=api_key)
+        return client
     
     def _get_random_emoji(self, context_type="general"):
-        """Get an appropriate emoji using AI or simple fallback"""
-        openai_api_key = os.getenv('OPENAI_API_KEY')
-        if openai_api_key:
-            try:
-                import openai
-                client = openai.OpenAI(api_key=openai_api_key)
-                
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": f"Return only ONE emoji appropriate for {context_type} context."},
-                        {"role": "user", "content": f"Give me an emoji for {context_type}"}
-                    ],
-                    max_tokens=5,
-                    temperature=0.3
-                )
-                
-                ai_emoji = response.choices[0].message.content.strip()
-                if len(ai_emoji) <= 4:  # Valid emoji length
-                    return ai_emoji
-            except:
-                pass
-        
-        # Simple fallback
-        return "📚" if context_type == "course" else "📝"
+        """Get an appropriate emoji for the context"""
+        return _CONTEXT_EMOJI.get(context_type, _CONTEXT_EMOJI['general'])
 
-    def _get_conversation_history(self, session_id, limit=None):
-        """Get conversation history for a session, limited to the last N messages"""
+    def _get_conversation_history(self, session_id, limit=None, fields=None):
+        """Get conversation history for a session, limited to the last N messages (optionally only some fields)"""
         if limit is None:
             limit = self.MAX_HISTORY_MESSAGES * 2  # Multiply by 2 since we count pairs
             
         messages = Message.objects.filter(
             user=self.request.user,
             session_id=session_id
-        ).order_by('-timestamp')[:limit]
+        ).order_by('-timestamp')
+        if fields:
+            messages = messages.only(*fields)
         
-        # Convert to list and reverse to get chronological order
-        messages = list(reversed(messages))
-        return messages
+        # Newest first off the index, flipped to chronological order with one slice
+        return list(messages[:limit])[::-1]
 
     def _format_system_prompt(self, course_info=None, last_user_msg=None, last_ai_msg=None):
         """Format a comprehensive system prompt with conversation context"""
@@ -524,15 +687,19 @@ Build naturally on what was discussed - reference previous topics when relevant
         return formatted_messages
 
     def _should_reset_session(self, message_content):
-        """Pure AI detection for session reset requests - no hardcoded fallbacks"""
+        """Detect session reset requests locally; the AI is only asked about ambiguous ones when enabled"""
+        if _RESET_REQUEST_RE.match(message_content):
+            return True
+        if not (getattr(settings, 'CHAT_RESET_AI_FALLBACK', False) and _RESET_HINT_RE.search(message_content)):
+            return False
+
         openai_api_key = os.getenv('OPENAI_API_KEY')
         if not openai_api_key:
             # No AI available, don't know - return False
             return False
             
         try:
-            import openai
-            client = openai.OpenAI(api_key=openai_api_key)
+            client = self._get_openai_client(openai_api_key)
             
             response = client.chat.completions.create(
                 model="gpt-4o-mini",
@@ -554,12 +721,11 @@ Build naturally on what was discussed - reference previous topics when relevant
         return uuid.uuid4()
 
     def _cleanup_old_sessions(self):
-        """Clean up sessions older than SESSION_EXPIRY_DAYS"""
+        """Clean up sessions older than SESSION_EXPIRY_DAYS on a sample of requests, one batch at most"""
+        if random.random() >= self.CLEANUP_SAMPLE_RATE:
+            return
         expiry_date = timezone.now() - timezone.timedelta(days=self.SESSION_EXPIRY_DAYS)
-        Message.objects.filter(
-            user=self.request.user,
-            timestamp__lt=expiry_date
-        ).delete()
+        Message.delete_expired(expiry_date, user=self.request.user, batch_size=self.CLEANUP_BATCH_SIZE, max_batches=1)
 
     def _should_provide_honest_response(self, message_content):
         """Let the AI respond naturally - no rigid filtering"""
@@ -569,106 +735,27 @@ Build naturally on what was discussed - reference previous topics when relevant
 
     def _extract_course_code(self, message):
         """Extract course code from user message if it's a course query"""
-        import re
-        
         print(f"[KAIRO DEBUG] Extracting course code from: '{message}'")
-        
-        # Pattern to match course codes like CSI2132, CSI 2132, MAT1341, SDS 3386, etc.
-        # Matches 3-4 letters followed by optional space, then 3-4 digits, optional letter
-        # Enhanced to handle variations like "csi2110", "CSI-2110", "CSI_2110"
-        patterns = [
-            # Standard patterns: CSI2110, CSI 2110, etc.
-            r'\b[A-Z]{3,4}\s?\d{3,4}[A-Z]?\b',
-            # Patterns with separators: CSI-2110, CSI_2110
-            r'\b[A-Z]{3,4}[-_]\d{3,4}[A-Z]?\b',
-            # Lowercase patterns: csi2110, csi 2110 (will be converted to uppercase)
-            r'\b[a-zA-Z]{3,4}\s?\d{3,4}[A-Za-z]?\b'
-        ]
-        
-        # Try each pattern
-        for i, pattern in enumerate(patterns):
-            match = re.search(pattern, message.upper())
-            if match:
-                # Clean up the matched code: remove spaces, dashes, underscores
-                course_code = match.group(0).replace(' ', '').replace('-', '').replace('_', '')
-                print(f"[KAIRO DEBUG] Pattern {i+1} matched: {match.group(0)} -> {course_code}")
-                
-                # Validate it looks like a real course code (3-4 letters + 3-4 digits)
-                if re.match(r'^[A-Z]{3,4}\d{3,4}[A-Z]?$', course_code):
-                    print(f"[KAIRO DEBUG] Valid course code extracted: {course_code}")
-                    return course_code
-                else:
-                    print(f"[KAIRO DEBUG] Invalid course code format: {course_code}")
-        
+
+        match = _COURSE_CODE_RE.search(message.upper())
+        if match:
+            # Rebuild the code from its parts, dropping any space, dash or underscore
+            course_code = ''.join(match.groups())
+            print(f"[KAIRO DEBUG] Valid course code extracted: {match.group(0)} -> {course_code}")
+            return course_code
+
         print(f"[KAIRO DEBUG] No course code found in message")
         return None
 
     def _is_course_info_query(self, message):
         """Check if the message is asking for general course information"""
-        course_info_keywords = [
-            'tell me about', 'what is', 'describe', 'info about', 'information about',
-            'course description', 'course info', 'about the course', 'about this course',
-            'details about', 'what\'s', 'whats', 'course details', 'overview of',
-            'summary of', 'explain', 'breakdown of', 'rundown of',
-            # Enhanced patterns for more natural queries
-            'what does', 'what do you know about', 'give me info on', 'give me information on',
-            'tell me what', 'can you tell me about', 'i want to know about',
-            'i need info on', 'i need information about', 'help me understand',
-            'what can you tell me about', 'what course is', 'what kind of course is',
-            'what subject is', 'what\'s covered in', 'whats covered in',
-            'what do they teach in', 'what will i learn in', 'what topics are covered',
-            'course content', 'course material', 'what\'s taught in', 'whats taught in',
-            'course outline', 'syllabus', 'curriculum', 'what are they about',
-            # Subject-specific queries
-            'about', 'is about', 'covers', 'teaches', 'focuses on',
-            # Question patterns
-            'how would you describe', 'can you describe', 'explain what',
-            'what kind of', 'what type of', 'what sort of'
-        ]
-        
-        message_lower = message.lower()
-        
-        # Check for direct keyword matches
-        for keyword in course_info_keywords:
-            if keyword in message_lower:
-                return True
+        # Check for direct keyword matches (one scan for all keywords)
+        if _COURSE_INFO_KEYWORD_RE.search(message):
+            return True
         
         # Check for pattern-based matches using regex
-        import re
-        
-        # Pattern for course codes (3-4 letters + 3-4 digits, case insensitive)
-        course_code_pattern = r'\b[A-Z]{3,4}\s?\d{3,4}[A-Z]?\b'
-        
-        # Enhanced patterns for course information queries
-        course_info_patterns = [
-            # "What is CSI 2110?" / "What's MAT 1320?"
-            rf'what\'?s?\s+({course_code_pattern})',
-            rf'({course_code_pattern})\s+is\s+about',
-            rf'about\s+({course_code_pattern})',
-            # "CSI 2110 about" / "tell me CSI 2110"
-            rf'({course_code_pattern})\s+(about|info|information|details)',
-            rf'(tell|give)\s+me\s+({course_code_pattern})',
-            # "What does CSI 2110 cover?" / "What do they teach in MAT 1320?"
-            rf'what\s+(does?|do|will)\s+({course_code_pattern})\s+(cover|teach|focus)',
-            rf'what\s+(does?|do|will)\s+.*\s+teach\s+in\s+({course_code_pattern})',
-            # "What's CSI 2110 all about?" / "What is MAT 1320 like?"
-            rf'what\'?s?\s+({course_code_pattern})\s+.*(about|like)',
-            rf'({course_code_pattern})\s+.*(course|class|subject)',
-            # Course description specific patterns
-            rf'description\s+(of\s+)?({course_code_pattern})',
-            rf'({course_code_pattern})\s+description',
-            # General inquiry patterns
-            rf'know\s+about\s+({course_code_pattern})',
-            rf'({course_code_pattern})\s+(overview|summary|breakdown)',
-            # Content-focused queries
-            rf'what.*covered.*({course_code_pattern})',
-            rf'({course_code_pattern}).*covered',
-            rf'topics.*({course_code_pattern})',
-            rf'({course_code_pattern}).*topics'
-        ]
-        
-        for pattern in course_info_patterns:
-            if re.search(pattern, message_lower, re.IGNORECASE):
+        for pattern in _COURSE_INFO_RES:
+            if pattern.search(message):
                 return True
         
         return False
@@ -1067,18 +1154,8 @@ Build naturally on what was discussed - reference previous topics when relevant
         """Check if message is asking for courses at a specific level"""
         message_lower = message.lower()
         
-        # Look for level patterns: "1000 level", "2000-level", "3000 level", "4000 level"
-        level_patterns = [
-            r'\b([1-4])000\s*level\b',
-            r'\b([1-4])000[-\s]*level\b',
-            r'\blevel\s*([1-4])000\b',
-            r'\b([1-4])000\s*courses?\b',
-            r'\b([1-4])000[-\s]*courses?\b'
-        ]
-        
-        import re
-        for pattern in level_patterns:
-            if re.search(pattern, message_lower):
+        for pattern in _COURSE_LEVEL_RES:
+            if pattern.search(message_lower):
                 return True
         
         return False
@@ -1088,18 +1165,9 @@ Build naturally on what was discussed - reference previous topics when relevant
         message_lower = message.lower()
         
         # Extract level (1000, 2000, 3000, 4000)
-        import re
-        level_patterns = [
-            r'\b([1-4])000\s*level\b',
-            r'\b([1-4])000[-\s]*level\b', 
-            r'\blevel\s*([1-4])000\b',
-            r'\b([1-4])000\s*courses?\b',
-            r'\b([1-4])000[-\s]*courses?\b'
-        ]
-        
         level = None
-        for pattern in level_patterns:
-            match = re.search(pattern, message_lower)
+        for pattern in _COURSE_LEVEL_RES:
+            match = pattern.search(message_lower)
             if match:
                 level = f"{match.group(1)}000"
                 break
@@ -1207,25 +1275,8 @@ Build naturally on what was discussed - reference previous topics when relevant
         """Check if this is a general RMP request without a specific professor name"""
         message_lower = message_content.lower()
         
-        # Keywords that indicate a general RMP request
-        general_rmp_keywords = [
-            'help me find a prof on rmp',
-            'help me find a professor on rmp',
-            'find a prof on rmp',
-            'find a professor on rmp',
-            'help me find rmp',
-            'find rmp for',
-            'rmp search',
-            'rate my professor search',
-            'help with rmp',
-            'can you help me find a prof',
-            'can you help me find a professor',
-            'help me look up a prof',
-            'help me look up a professor'
-        ]
-        
         # Check if it's a general request
-        is_general_request = any(keyword in message_lower for keyword in general_rmp_keywords)
+        is_general_request = any(keyword in message_lower for keyword in _GENERAL_RMP_KEYWORDS)
         
         if is_general_request:
             # Make sure there's no specific professor name mentioned
@@ -1248,65 +1299,27 @@ Build naturally on what was discussed - reference previous topics when relevant
 
     def _extract_professor_name(self, message):
         """Extract professor name from user message if it's a professor query"""
-        import re
-        
         message_lower = message.lower()
         
         # First check if this is a general RMP request without a specific name
         if self._is_general_rmp_request(message):
             return None
         
-        # Enhanced patterns to extract professor names (more flexible and comprehensive)
-        patterns = [
-            # Patterns with explicit professor keywords
-            # "help me find RMP for Prof Vida" or "find RMP for Professor Smith"
-            r'(?:rmp|rate my professor|rating|review).*?(?:for|of)\s+(?:professor|prof\.?|dr\.?|doctor)\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
-            # "Professor John Smith" or "Prof John Smith" - captures multiple names
-            r'(?:professor|prof\.?|dr\.?|doctor)\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
-            # "John Smith" after phrases like "about", "tell me about", "who is", "find", "search"
-            r'(?:about|tell me about|who is|find|search|for)\s+(?:professor|prof\.?|dr\.?|doctor)?\s*([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
-            # "Prof. Smith" or "Dr. Smith" - single or multiple names
-            r'(?:prof\.?|dr\.?)\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
-            # Names in quotes
-            r'["\']([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)["\']',
-            # Capitalized names that appear after professor keywords (broader search)
-            r'(?:professor|prof\.?|dr\.?|doctor|instructor|teacher).*?([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
-            # "Prof Vida" or "Dr Smith" (no period, common casual usage)
-            r'(?:prof|dr|professor|doctor)\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
-            # "help me find a RMP for Vida" - name without title
-            r'(?:rmp|rate my professor|rating|review).*?(?:for|of)\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
-            # "give me for prof wassim" - casual requests
-            r'(?:give me|get me|find|search).*?(?:for|about)\s+(?:prof\.?|professor|dr\.?|doctor)\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
-            
-            # NEW: Patterns that work without professor keywords
-            # "RMP for Nour" or "find RMP for Smith"
-            r'(?:rmp|rate my professor|rating|review).*?(?:for|of)\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
-            # Capitalized names that appear after context words
-            r'(?:about|tell me about|who is|find|search for|looking for|get|need)\s+([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)',
-            # Simple pattern: just a capitalized name (but be careful - only if it looks like a professor context)
-            r'\b([A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*)\b'
-        ]
-        
         # Check if there are any professor-related context words or RMP mentions
-        professor_context_keywords = [
-            'professor', 'prof', 'dr.', 'doctor', 'instructor', 'teacher',
-            'prof.', 'proffesor', 'proffessor', 'rmp', 'rate my professor',
-            'rating', 'review', 'grade', 'grading', 'teaches', 'taught'
-        ]
-        
-        has_professor_context = any(keyword in message_lower for keyword in professor_context_keywords)
+        has_professor_context = any(keyword in message_lower for keyword in _PROFESSOR_CONTEXT_KEYWORDS)
         
-        for i, pattern in enumerate(patterns):
-            match = re.search(pattern, message, re.IGNORECASE)
+        last_index = len(_PROFESSOR_NAME_PATTERNS) - 1
+        for i, pattern in enumerate(_PROFESSOR_NAME_PATTERNS):
+            match = pattern.search(message)
             if match:
                 name = match.group(1).strip()
                 # Basic validation - should have at least 2 characters and look like a name
-                if len(name) >= 2 and re.match(r'^[A-Za-z\s\.]+$', name):
+                if len(name) >= 2 and _PROFESSOR_NAME_VALID_RE.match(name):
                     # Clean up the name (remove extra spaces, etc.)
                     name = ' '.join(name.split())
                     
                     # For the last pattern (simple capitalized names), require professor context
-                    if i == len(patterns) - 1:  # Last pattern (simple capitalized names)
+                    if i == last_index:  # Last pattern (simple capitalized names)
                         if has_professor_context:
                             return name
                     else:
@@ -1358,7 +1371,7 @@ Examples of non-historical queries (return false):
 - "Who teaches PHY1122?"
 """
             
-            client = openai.OpenAI(api_key=openai_api_key)
+            client = self._get_openai_client(openai_api_key)
             response = client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
@@ -1609,8 +1622,8 @@ Examples of non-historical queries (return false):
                     "session_id": str(session_id)
                 }, status=status.HTTP_200_OK)
 
-            # Get conversation history
-            history = self._get_conversation_history(session_id)
+            # Get conversation history; the prompt only needs each message's role and content
+            history = self._get_conversation_history(session_id, fields=('role', 'content'))
             print(f"[KAIRO DEBUG] Retrieved conversation history: {len(history)} messages")
         except Exception as e:
             print(f"[KAIRO DEBUG] Error saving user message or getting history: {e}")
@@ -1750,7 +1763,7 @@ Examples:
 
 Do NOT include any links or say where you're getting the data from. Just acknowledge their question naturally."""
 
-                            client = openai.OpenAI(api_key=openai_api_key)
+                            client = self._get_openai_client(openai_api_key)
                             response = client.chat.completions.create(
                                 model="gpt-4o-mini",
                                 messages=[
@@ -1786,30 +1799,36 @@ Do NOT include any links or say where you're getting the data from. Just acknowl
             
             if openai_api_key:
                 try:
-                    import openai
-                    client = openai.OpenAI(api_key=openai_api_key)
-                    
-                    # AI detection for date queries
-                    date_response = client.chat.completions.create(
-                        model="gpt-4o-mini",
-                        messages=[
-                            {"role": "system", "content": "Return only 'true' if asking about important dates, deadlines, holidays, enrollment, payment dates, or academic calendar, otherwise 'false'."},
-                            {"role": "user", "content": user_message_content}
-                        ],
-                        max_tokens=10,
-                        temperature=0.0
-                    )
+                    client = self._get_openai_client(openai_api_key)
                     
-                    # AI detection for exam queries
-                    exam_response = client.chat.completions.create(
-                        model="gpt-4o-mini",
-                        messages=[
-                            {"role": "system", "content": "Return only 'true' if asking about exam schedules, final exams, midterms, or exam dates, otherwise 'false'."},
-                            {"role": "user", "content": user_message_content}
-                        ],
-                        max_tokens=10,
-                        temperature=0.0
-                    )
+                    # The date and exam checks are independent, so their round trips overlap
+                    with ThreadPoolExecutor(max_workers=2) as executor:
+                        # AI detection for date queries
+                        date_future = executor.submit(
+                            client.chat.completions.create,
+                            model="gpt-4o-mini",
+                            messages=[
+                                {"role": "system", "content": "Return only 'true' if asking about important dates, deadlines, holidays, enrollment, payment dates, or academic calendar, otherwise 'false'."},
+                                {"role": "user", "content": user_message_content}
+                            ],
+                            max_tokens=10,
+                            temperature=0.0
+                        )
+
+                        # AI detection for exam queries
+                        exam_future = executor.submit(
+                            client.chat.completions.create,
+                            model="gpt-4o-mini",
+                            messages=[
+                                {"role": "system", "content": "Return only 'true' if asking about exam schedules, final exams, midterms, or exam dates, otherwise 'false'."},
+                                {"role": "user", "content": user_message_content}
+                            ],
+                            max_tokens=10,
+                            temperature=0.0
+                        )
+
+                        date_response = date_future.result()
+                        exam_response = exam_future.result()
                     
                     is_date_query = date_response.choices[0].message.content.strip().lower() == 'true'
                     is_exam_query = exam_response.choices[0].message.content.strip().lower() == 'true'
@@ -1866,8 +1885,7 @@ Do NOT include any links or say where you're getting the data from. Just acknowl
                     print(f"Error decoding JSON from ExamEvent API: {e}")
 
         if not processed_by_custom_logic and ai_response_text is None:
-            # Get conversation history
-            history = self._get_conversation_history(session_id)
+            # Conversation history was loaded above; nothing has been saved to the session since
             
             # Prepare system prompt for general conversation
             system_prompt = self._format_system_prompt()
@@ -1885,7 +1903,7 @@ Do NOT include any links or say where you're getting the data from. Just acknowl
                 ai_response_text = "AI service is currently unavailable due to a configuration issue. Please try again later."
             else:
                 try:
-                    client = openai.OpenAI(api_key=openai_api_key)
+                    client = self._get_openai_client(openai_api_key)
                     completion = client.chat.completions.create(
                         model="gpt-4o-mini",
                         messages=messages_for_openai,
@@ -2391,8 +2409,7 @@ Do NOT include any links or say where you're getting the data from. Just acknowl
         openai_api_key = os.getenv('OPENAI_API_KEY')
         if openai_api_key:
             try:
-                import openai
-                client = openai.OpenAI(api_key=openai_api_key)
+                client = self._get_openai_client(openai_api_key)
                 
                 response = client.chat.completions.create(
                     model="gpt-4o-mini",
@@ -2633,7 +2650,7 @@ class IntentDetectionSerializer(serializers.Serializer):
     temperature = serializers.FloatField(required=False, default=0.1)
     max_tokens = serializers.IntegerField(required=False, default=300)
 
-class AIClassificationView(APIView):
+class AIClassificationView(AIResponseCacheMixin, APIView):
     permission_classes = [AllowAny]  # Allow unauthenticated access for classification
     
     def post(self, request, *args, **kwargs):
@@ -2733,7 +2750,7 @@ class AIClassificationView(APIView):
 
 
 # Legacy IntentDetectionView for backward compatibility
-class IntentDetectionView(APIView):
+class IntentDetectionView(AIResponseCacheMixin, APIView):
     permission_classes = [AllowAny]  # Allow unauthenticated access for intent detection
     
     def post(self, request, *args, **kwargs):
@@ -2917,7 +2934,7 @@ class ImportantDateFilter(django_filters.FilterSet):
             'description': ['icontains'] # Handled by CharFilter
         }
 
-class ImportantDateViewSet(viewsets.ModelViewSet):
+class ImportantDateViewSet(ValuesListMixin, viewsets.ModelViewSet):
     queryset = ImportantDate.objects.all()
     serializer_class = ImportantDateSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -2943,7 +2960,7 @@ class ExamEventFilter(django_filters.FilterSet):
             'title': ['icontains'] # Handled by CharFilter
         }
 
-class ExamEventViewSet(viewsets.ModelViewSet):
+class ExamEventViewSet(ValuesListMixin, viewsets.ModelViewSet):
     queryset = ExamEvent.objects.all()
     serializer_class = ExamEventSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -3378,6 +3395,67 @@ def rmp_stats(request):
             'error': str(e)
         }, status=500)
 
+
+# --- Batch API ---
+import io
+from urllib.parse import urlsplit
+from django.core.handlers.wsgi import WSGIRequest
+from django.urls import resolve, Resolver404
+
+class BatchRequestView(APIView):
+    """
+    Run several read-only API GETs in one round trip.
+    Body: {"requests": [{"method": "GET", "path": "/api/professors/search/?name=smith"}, ...]}
+    Returns one {"status", "body"} entry per sub-request, in order.
+    """
+    permission_classes = [AllowAny] # Each sub-request is authorized by its own view
+    MAX_BATCH_REQUESTS = 20
+
+    def post(self, request, *args, **kwargs):
+        sub_requests = request.data.get('requests') if isinstance(request.data, dict) else None
+        if not isinstance(sub_requests, list) or not sub_requests:
+            return Response({'error': 'requests must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(sub_requests) > self.MAX_BATCH_REQUESTS:
+            return Response({'error': f'At most {self.MAX_BATCH_REQUESTS} requests per batch'}, status=status.HTTP_400_BAD_REQUEST)
+
+        responses = [self._dispatch(request, sub_request) for sub_request in sub_requests]
+        return Response({'responses': responses}, status=status.HTTP_200_OK)
+
+    def _dispatch(self, request, sub_request):
+        if not isinstance(sub_request, dict):
+            return {'status': status.HTTP_400_BAD_REQUEST, 'body': {'error': 'Each request must be an object'}}
+        # Only reads are batched; writes keep their own requests and CSRF/throttling semantics
+        if str(sub_request.get('method', 'GET')).upper() != 'GET':
+            return {'status': status.HTTP_405_METHOD_NOT_ALLOWED, 'body': {'error': 'Only GET requests can be batched'}}
+
+        url = urlsplit(str(sub_request.get('path', '')))
+        if not url.path.startswith('/api/') or url.path.rstrip('/') == request.path.rstrip('/'):
+            return {'status': status.HTTP_400_BAD_REQUEST, 'body': {'error': 'path must be an /api/ endpoint other than the batch endpoint'}}
+        try:
+            match = resolve(url.path)
+        except Resolver404:
+            return {'status': status.HTTP_404_NOT_FOUND, 'body': {'error': 'Not found'}}
+
+        # Same headers (and so the same Authorization) as the batch request itself
+        environ = dict(request.META)
+        environ.update({
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'CONTENT_LENGTH': '0',
+            'wsgi.input': io.BytesIO(b''),
+        })
+        environ.pop('CONTENT_TYPE', None)
+        response = match.func(WSGIRequest(environ), *match.args, **match.kwargs)
+        if hasattr(response, 'render') and not response.is_rendered:
+            response.render()
+
+        if response.get('Content-Type', '').startswith('application/json'):
+            body = json.loads(response.content or b'null')
+        else:
+            body = response.content.decode(response.charset or 'utf-8', errors='replace')
+        return {'status': response.status_code, 'body': body}
+
 class ProfessorSyncView(APIView):
     permission_classes = [AllowAny]  # Adjust permissions as needed
     
@@ -3682,8 +3760,7 @@ class ScheduleGenerationView(APIView):
             
             # Persist: clear current term schedule, then add selected sections
             try:
-                ScheduleService.clear_user_schedule(request.user, term, year)
-                ScheduleService.add_sections_to_calendar(request.user, selected_map, term, year)
+                ScheduleService.replace_user_schedule(request.user, selected_map, term, year)
             except Exception as e:
                 print(f"❌ Error persisting schedule changes: {e}")
             
@@ -3854,8 +3931,7 @@ class ScheduleGenerationView(APIView):
         # Persist to calendar (clear term, then add)
         from .models import UserCalendar
         try:
-            ScheduleService.clear_user_schedule(request.user, term, year)
-            events_created = ScheduleService.add_sections_to_calendar(request.user, selected_sections_map, term, year)
+            events_created = ScheduleService.replace_user_schedule(request.user, selected_sections_map, term, year)
             print(f"✅ Schedule saved successfully: {events_created} events created from {len(successful_courses)} courses")
             saved_count = UserCalendar.objects.filter(user=request.user).count()
             print(f"🔍 Verification: {saved_count} events found in database for user")
@@ -0,0 +1,10 @@
+import os
+
+import pytest
+
+
+@pytest.fixture(scope='session', autouse=True)
+def openai_api_key():
+    # The chat views build an OpenAI client from this; tests patch the client itself
+    os.environ.setdefault('OPENAI_API_KEY', 'test_api_key_value')
+    return os.environ['OPENAI_API_KEY']
@@ -9,6 +9,15 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
+# Use uvloop's event loop when it is installed (optional; not in requirements.txt).
+# Uvicorn already picks it up on its own with --loop auto; this covers other ASGI servers.
+try:
+    import uvloop
+except ImportError:
+    pass
+else:
+    uvloop.install()
+
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'kairo.settings')
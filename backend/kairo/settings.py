@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from datetime import timedelta
 from dotenv import load_dotenv
 
@@ -132,7 +133,10 @@ if 'DATABASE_URL' in os.environ:
     try:
         parsed_db = dj_database_url.parse(os.environ['DATABASE_URL'])
         DATABASES['default'] = parsed_db
-        DATABASES['default']['CONN_MAX_AGE'] = 0  # Disable connection pooling to avoid stale connections
+        # Reuse each worker's connection across requests instead of reconnecting (TCP + TLS + auth)
+        # per request; CONN_HEALTH_CHECKS below replaces connections that went stale while idle.
+        # Set DB_CONN_MAX_AGE=0 to close after every request (e.g. behind pgbouncer).
+        DATABASES['default']['CONN_MAX_AGE'] = get_env_var_as_int('DB_CONN_MAX_AGE', '60')
         
         # Add connection retry settings for Railway with better timeouts
         if 'OPTIONS' not in DATABASES['default']:
@@ -147,7 +151,7 @@ if 'DATABASE_URL' in os.environ:
             'keepalives_count': 3,
         })
         
-        # Add connection retry at Django level
+        # Ping persistent connections before reuse so a dropped one is reopened, not errored
         DATABASES['default']['CONN_HEALTH_CHECKS'] = True
         
         print(f"Configured PostgreSQL database: {parsed_db['NAME']}")
@@ -157,6 +161,27 @@ if 'DATABASE_URL' in os.environ:
         print("Falling back to SQLite database")
         # Keep the default SQLite configuration
 
+# --- Cache Configuration ---
+# Backs the response cache on the read-mostly reference endpoints (see api.utils.cached).
+# Redis when REDIS_URL is set, so every worker shares one cache; per-process memory otherwise.
+# Identical classify/intent requests are answered from the cache for AI_CACHE_TTL seconds
+AI_CACHE_ENABLED = get_env_var_as_boolean('AI_CACHE_ENABLED', 'True')
+AI_CACHE_TTL = get_env_var_as_int('AI_CACHE_TTL', '3600')
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -228,6 +253,9 @@ else:
             if origin not in CORS_ALLOWED_ORIGINS:
                 CORS_ALLOWED_ORIGINS.append(origin)
 
+# Public frontend origin used to build share links (see api.utils.build_url)
+SITE_URL = os.environ.get('SITE_URL', 'https://kairoo.ca')
+
 extra_origin = os.environ.get('NEXT_PUBLIC_SITE_URL') or os.environ.get('FRONTEND_ORIGIN')
 if extra_origin and extra_origin not in CORS_ALLOWED_ORIGINS:
     CORS_ALLOWED_ORIGINS.append(extra_origin)
@@ -351,7 +379,7 @@ SERVER_EMAIL = os.environ.get('DJANGO_SERVER_EMAIL', 'root@localhost')  # For er
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -359,6 +387,9 @@ REST_FRAMEWORK = {
 }
 
 # JWT Settings
+# Seconds an authenticated user stays cached between requests (see api.authentication)
+JWT_USER_CACHE_TTL = get_env_var_as_int('JWT_USER_CACHE_TTL', '300')
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
@@ -398,3 +429,54 @@ SIMPLE_JWT = {
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 if not OPENAI_API_KEY:
     print("WARNING: OPENAI_API_KEY environment variable is not set. AI features will not work.")
+
+# Chat reset requests are recognised locally; set this to also ask the AI about messages
+# that use reset vocabulary without being a plain reset command
+CHAT_RESET_AI_FALLBACK = get_env_var_as_boolean('CHAT_RESET_AI_FALLBACK', 'False')
+
+# --- Test Settings ---
+# Applied when running `manage.py test` or pytest (pytest-django)
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
+if TESTING:
+    # Test users don't need PBKDF2's key stretching; one MD5 digest keeps create_user cheap
+    PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+    # Build test tables straight from the models instead of replaying every migration.
+    # Set DJANGO_TEST_RUN_MIGRATIONS=True (CI does) to exercise the real migrations.
+    class DisableMigrations:
+        def __contains__(self, item):
+            return True
+
+        def __getitem__(self, item):
+            return None
+
+    if not get_env_var_as_boolean('DJANGO_TEST_RUN_MIGRATIONS'):
+        MIGRATION_MODULES = DisableMigrations()
+
+    # Run tests against in-memory SQLite even when DATABASE_URL points at Postgres:
+    # no fsync or network round trip per INSERT/SAVEPOINT. Each xdist worker is its own
+    # process, so each gets a private in-memory database. Set DJANGO_TEST_USE_DATABASE_URL=True
+    # to test against the configured database instead.
+    if not get_env_var_as_boolean('DJANGO_TEST_USE_DATABASE_URL'):
+        DATABASES = {
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+                'TEST': {'NAME': ':memory:'},
+            }
+        }
+
+    # Keep cached responses in process memory, never in a shared Redis
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    # Test transactions roll back without post_delete, so user ids get reused across
+    # tests; don't let one test authenticate as another test's cached user
+    JWT_USER_CACHE_TTL = 0
+
+    # The test runner forces DEBUG off anyway; keep settings consistent and skip log handler setup
+    DEBUG = False
+    LOGGING_CONFIG = None
@@ -0,0 +1,27 @@
+#!/usr/bin/env bash
+# Run the backend test suite.
+# Tests use an in-memory SQLite database unless DJANGO_TEST_USE_DATABASE_URL=True;
+# only then do local runs reuse the test database between invocations (--keepdb).
+# CI (CI=true) or REUSE_DB=0 rebuilds it from scratch.
+set -o errexit
+
+if [ -d "backend" ]; then
+    cd backend
+fi
+
+# Same truthy values as the settings' get_env_var_as_boolean
+KEEPDB_FLAG=""
+case "$(echo "${DJANGO_TEST_USE_DATABASE_URL:-false}" | tr '[:upper:]' '[:lower:]')" in
+    true|1|t)
+        if [ "${CI:-false}" != "true" ] && [ "${REUSE_DB:-1}" != "0" ]; then
+            KEEPDB_FLAG="--keepdb"
+        fi
+        ;;
+esac
+
+# Test settings build tables from the models; CI still replays the real migrations
+if [ "${CI:-false}" = "true" ]; then
+    export DJANGO_TEST_RUN_MIGRATIONS=True
+fi
+
+python manage.py test api $KEEPDB_FLAG "$@"